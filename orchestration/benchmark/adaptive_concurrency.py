@@ -0,0 +1,89 @@
+"""
+Fixed vs adaptive (AIMD) download/upload concurrency in scraping().
+
+Serves synthetic DispatchIS archives with a fixed per-download latency, in
+two scenarios: an unthrottled server, where more requests in flight means
+more throughput, and a server that answers 503 beyond `--capacity`
+concurrent downloads, like nemweb under load. Each scenario is ingested with
+a few fixed worker counts and with the adaptive limiter, reporting wall
+time, files ingested, HTTP retries and the download limit the run ended on.
+
+    python orchestration/benchmark/adaptive_concurrency.py --files 240 --latency 0.2 --capacity 6
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, "..", "new"))
+
+from obstore.store import MemoryStore
+
+import scraping as scraping_module
+from nemweb_stub import make_archive, serve_directory
+from storage import ObstoreBackend
+
+
+class SlowBackend(ObstoreBackend):
+    """Storage backend whose put() takes at least `upload_latency` seconds."""
+
+    def __init__(self, store, upload_latency: float):
+        super().__init__(store)
+        self.upload_latency = upload_latency
+
+    def put(self, path: str, data: bytes, mode: str = "overwrite") -> None:
+        time.sleep(self.upload_latency)
+        super().put(path, data, mode)
+
+
+def run(src_dir: str, files: int, latency: float, capacity: int, upload_latency: float, workers):
+    """workers: an int for a fixed limit, None for the adaptive limiter with its default bounds."""
+    base_url, server = serve_directory(src_dir, delay=latency, capacity=capacity)
+    bounds = {} if workers is None else {"min_file_workers": workers, "max_file_workers": workers}
+    try:
+        start = time.perf_counter()
+        result = scraping_module.scraping([base_url], ["Reports/Current/DispatchIS_Reports/"], files,
+                                          "ws", "lh", 1, store=SlowBackend(MemoryStore(), upload_latency),
+                                          watermark=False, **bounds)
+        elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+    metrics = result.metrics
+    return elapsed, metrics.files, metrics.http["retries"], metrics.limits["download"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=240)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per archive download")
+    parser.add_argument("--upload-latency", type=float, default=0.02, help="seconds per upload")
+    parser.add_argument("--capacity", type=int, default=6, help="concurrent downloads before the server throttles")
+    parser.add_argument("--fixed", default="2,8,32", help="comma separated fixed worker counts to compare")
+    parser.add_argument("--member-kb", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as src_dir:
+        for i in range(args.files):
+            stamp = f"20241018{i // 12:02d}{i % 12 * 5:02d}"
+            make_archive(src_dir, f"PUBLIC_DISPATCHIS_{stamp}_0000000438{i:06d}.zip",
+                         f"PUBLIC_DISPATCHIS_{stamp}_0000000438{i:06d}.CSV", args.member_kb * 1024, seed=i)
+
+        rows = []
+        for scenario, capacity in (("unthrottled", 0), (f"503 above {args.capacity}", args.capacity)):
+            for workers in [int(w) for w in args.fixed.split(",")] + [None]:
+                elapsed, ingested, retries, limit = run(src_dir, args.files, args.latency, capacity,
+                                                        args.upload_latency, workers)
+                label = "adaptive" if workers is None else f"fixed {workers}"
+                rows.append((scenario, label, elapsed, ingested, retries, limit))
+
+    print(f"\n{args.files} archives, {args.latency}s per download, {args.upload_latency}s per upload\n")
+    print(f"{'scenario':<16}{'workers':<10}{'wall s':>8}{'files':>7}{'retries':>9}{'limit end':>11}{'peak':>6}")
+    for scenario, label, elapsed, ingested, retries, limit in rows:
+        print(f"{scenario:<16}{label:<10}{elapsed:>8.2f}{ingested:>7}{retries:>9}{limit['limit']:>11}{limit['peak']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Threaded scraping() vs scraping_async() on synthetic PUBLIC_DISPATCHSCADA archives.
+
+The nemweb stand-in runs in a child process with a fixed per-download latency,
+and both engines write to a MemoryStore. Reported per engine: files/sec,
+peak OS thread count of this process and CPU seconds.
+
+    python orchestration/benchmark/async_vs_threaded.py --urls 6 --files 48 --latency 0.05
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, "..", "new"))
+
+from obstore.store import MemoryStore
+
+from nemweb_stub import make_scada_day, serve_directory_process
+from scraping import scraping, scraping_async
+
+
+def os_thread_count() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("Threads:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return threading.active_count()
+
+
+class ThreadSampler:
+    """Records the peak thread count while the block runs (the sampler itself excluded)."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, os_thread_count() - 1)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def measure(label: str, run, n_files: int) -> None:
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    with ThreadSampler() as sampler:
+        result = run()
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+    if result != 1:
+        raise SystemExit(f"{label} did not ingest any file")
+    print(f"{label:9} {n_files / wall:8.1f} files/s  {sampler.peak:4d} threads  {cpu:6.2f}s CPU  {wall:6.2f}s wall")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--urls", type=int, default=6)
+    parser.add_argument("--files", type=int, default=48, help="archives per URL")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per archive download")
+    parser.add_argument("--max-workers", type=int, default=6, help="URL pool size for the threaded engine")
+    # Defaults give asyncio the same request concurrency as the threaded engine (max_workers x 8);
+    # every feed shares one host here
+    parser.add_argument("--max-concurrency", type=int, default=48, help="asyncio global limit")
+    parser.add_argument("--per-host", type=int, default=48, help="asyncio per-host limit")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as src_dir:
+        for u in range(args.urls):
+            make_scada_day(os.path.join(src_dir, f"feed{u}"), args.files)
+        base_url, server = serve_directory_process(src_dir, delay=args.latency)
+        urls = [f"{base_url}feed{u}/" for u in range(args.urls)]
+        folders = [f"Reports/Current/Dispatch_SCADA_{u}/" for u in range(args.urls)]
+        n_files = args.urls * args.files
+        try:
+            measure("threaded", lambda: scraping(urls, folders, args.files, "ws", "lh", args.max_workers,
+                                                 store=MemoryStore()), n_files)
+            measure("asyncio", lambda: asyncio.run(scraping_async(urls, folders, args.files, "ws", "lh",
+                                                                  max_concurrency=args.max_concurrency,
+                                                                  per_host_limit=args.per_host,
+                                                                  store=MemoryStore())), n_files)
+        finally:
+            server.terminate()
+
+
+if __name__ == "__main__":
+    main()
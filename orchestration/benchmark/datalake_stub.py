@@ -0,0 +1,141 @@
+"""
+In-memory stand-in for the lakehouse connection a Fabric UDF gets from
+FabricLakehouseClient.connectToFiles() (an Azure Data Lake file system
+client), so FabricFilesBackend can be exercised without a workspace.
+
+Covers what FabricFilesBackend calls: get_file_client() with
+upload_data/download_file/get_file_properties/delete_file and the
+create_file/append_data/flush_data upload (data is staged until flushed, and
+appends must be contiguous), rename_file() and get_paths(). UDFs that land
+files through the same calls, like udf/excel.py, can use it too. Errors are azure-core's
+ResourceExistsError/ResourceNotFoundError, as from the service; `latency`
+adds a delay to every call.
+"""
+import threading
+import time
+from types import SimpleNamespace
+
+from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
+
+
+class DataLakeStub:
+
+    def __init__(self, latency: float = 0.0, file_system_name: str = "lakehouse"):
+        self.latency = latency
+        self.file_system_name = file_system_name
+        self.files = {}
+        self.staged = {}
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def _call(self) -> None:
+        with self.lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get_file_client(self, path: str) -> "_FileClient":
+        return _FileClient(self, path)
+
+    def get_paths(self, path: str = None, recursive: bool = True):
+        self._call()
+        prefix = path.rstrip("/") + "/" if path else ""
+        with self.lock:
+            names = sorted(name for name in self.files if name.startswith(prefix))
+            if prefix and not names:
+                raise ResourceNotFoundError(f"The specified path does not exist: {path}")
+            listed = [(name, len(self.files[name])) for name in names]
+        directories = set()
+        for name, size in listed:
+            parts = name[len(prefix):].split("/")
+            for depth in range(1, len(parts)):
+                directories.add(prefix + "/".join(parts[:depth]))
+            if recursive or len(parts) == 1:
+                yield SimpleNamespace(name=name, is_directory=False, content_length=size)
+        for name in sorted(directories):
+            if recursive or "/" not in name[len(prefix):]:
+                yield SimpleNamespace(name=name, is_directory=True, content_length=0)
+
+    def close(self) -> None:
+        pass
+
+
+class _FileClient:
+
+    def __init__(self, lake: DataLakeStub, path: str):
+        self.lake = lake
+        self.path = path
+        self.file_system_name = lake.file_system_name
+
+    def _existing(self) -> bytes:
+        try:
+            return self.lake.files[self.path]
+        except KeyError:
+            raise ResourceNotFoundError(f"The specified path does not exist: {self.path}") from None
+
+    def upload_data(self, data, overwrite: bool = False, **kwargs) -> None:
+        self.lake._call()
+        data = data.encode("utf-8") if isinstance(data, str) else bytes(data)
+        with self.lake.lock:
+            if not overwrite and self.path in self.lake.files:
+                raise ResourceExistsError(f"The specified path already exists: {self.path}")
+            self.lake.files[self.path] = data
+
+    def download_file(self):
+        self.lake._call()
+        with self.lake.lock:
+            data = self._existing()
+        return SimpleNamespace(readall=lambda: data)
+
+    def get_file_properties(self):
+        self.lake._call()
+        with self.lake.lock:
+            return SimpleNamespace(size=len(self._existing()))
+
+    def exists(self) -> bool:
+        self.lake._call()
+        with self.lake.lock:
+            return self.path in self.lake.files
+
+    def delete_file(self) -> None:
+        self.lake._call()
+        with self.lake.lock:
+            self._existing()
+            del self.lake.files[self.path]
+            self.lake.staged.pop(self.path, None)
+
+    def create_file(self) -> None:
+        self.lake._call()
+        with self.lake.lock:
+            self.lake.files[self.path] = b""
+            self.lake.staged[self.path] = bytearray()
+
+    def append_data(self, data, offset: int, length: int = None) -> None:
+        self.lake._call()
+        with self.lake.lock:
+            staged = self.lake.staged.get(self.path)
+            if staged is None:
+                raise ResourceNotFoundError(f"The specified path does not exist: {self.path}")
+            if offset != len(staged):
+                raise ValueError(f"append at {offset}, {len(staged)} bytes staged for {self.path}")
+            staged += bytes(data)[:length]
+
+    def flush_data(self, offset: int) -> None:
+        self.lake._call()
+        with self.lake.lock:
+            staged = self.lake.staged.pop(self.path, bytearray())
+            self.lake.files[self.path] = bytes(staged[:offset])
+
+    def rename_file(self, new_name: str) -> "_FileClient":
+        """new_name is "<file system>/<path>"; replaces an existing file, as the service does by default."""
+        self.lake._call()
+        file_system, _, path = new_name.partition("/")
+        if file_system != self.lake.file_system_name:
+            raise ValueError(f"rename to another file system: {new_name}")
+        with self.lake.lock:
+            self.lake.files[path] = self._existing()
+            del self.lake.files[self.path]
+        return _FileClient(self.lake, path)
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,146 @@
+"""
+Offline ingestion benchmark: sweeps scraping() over workers x files x codecs.
+
+Generates a synthetic AEMO dataset (nemweb_stub.make_dataset), serves it
+from one local server with the given latency, bandwidth, throttling and
+error injection, and ingests it once per combination into a fresh
+MemoryStore or LocalStore, from the nemweb-style HTML listing and/or the
+GitHub contents API look-alike. No request leaves the machine.
+
+"workers" are the file workers: a number pins both download and upload
+concurrency, "adaptive" leaves the AdaptiveLimiter to its default bounds.
+
+Writes to --out:
+  results.csv           one row per run (wall, files, MB in/out, MB/s, HTTP retries, CPU)
+  <run>.folded          StackSampler profile of the run, for flamegraph.pl/inferno/speedscope
+  <run>.log             what scraping() printed
+
+    python orchestration/benchmark/ingest_suite.py --files 60,240 --workers 4,16,adaptive --codecs gzip,zstd
+    python orchestration/benchmark/ingest_suite.py --dataset daily --files 4 --source github --store local \
+        --latency 0.1 --bandwidth 20000000 --error-rate 0.05
+"""
+import argparse
+import contextlib
+import csv
+import io
+import os
+import resource
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, "..", "new"))
+
+from obstore.store import LocalStore, MemoryStore
+
+import scraping as scraping_module
+from nemweb_stub import make_dataset, serve_directory
+from stack_sampler import StackSampler
+
+FOLDERS = {"dispatchis": "Reports/Current/DispatchIS_Reports/", "scada": "Reports/Current/Dispatch_SCADA/",
+           "daily": "Reports/Current/Daily_Reports/"}
+COLUMNS = ("source", "store", "files", "workers", "codec", "wall_s", "ingested", "mb_in", "mb_out", "mb_per_s",
+           "retries", "cpu_s")
+
+
+def cpu_seconds() -> float:
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def source_url(source: str, base_url: str, folder: str) -> str:
+    if source == "nemweb":
+        return base_url + folder
+    # Listed through scraping.GITHUB_API, which main() points at the local server
+    return "https://github.com/aemo/nemweb/tree/main/" + folder
+
+
+def run_once(url: str, folder: str, files: int, workers: str, codec: str, store_kind: str, workdir: str):
+    """One ingestion into a fresh store; returns (row values, StackSampler, printed log)."""
+    store = MemoryStore() if store_kind == "memory" else LocalStore(tempfile.mkdtemp(dir=workdir))
+    bounds = {} if workers == "adaptive" else {"min_file_workers": int(workers), "max_file_workers": int(workers)}
+    log = io.StringIO()
+    start_cpu, start = cpu_seconds(), time.perf_counter()
+    with StackSampler() as sampler, contextlib.redirect_stdout(log):
+        result = scraping_module.scraping([url], [folder], files, "ws", "lh", 1, store=store, codec=codec,
+                                          watermark=False, **bounds)
+    wall, cpu = time.perf_counter() - start, cpu_seconds() - start_cpu
+    totals = result.metrics.phase_totals()
+    mb_in = totals.get("download", {}).get("bytes_in", 0) / 1e6
+    mb_out = sum(totals.get(phase, {}).get("bytes_out", 0) for phase in ("upload", "recompress_upload")) / 1e6
+    return (wall, result.metrics.files, mb_in, mb_out, result.metrics.http.get("retries", 0), cpu), sampler, log
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset", default="dispatchis", choices=sorted(FOLDERS))
+    parser.add_argument("--files", default="60,240", help="comma separated file counts")
+    parser.add_argument("--workers", default="4,16,adaptive", help="comma separated, numbers or 'adaptive'")
+    parser.add_argument("--codecs", default="gzip,zstd")
+    parser.add_argument("--source", default="nemweb", help="comma separated: nemweb, github")
+    parser.add_argument("--store", default="memory", choices=("memory", "local"))
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per archive download")
+    parser.add_argument("--bandwidth", type=int, default=0, help="bytes/s per response, 0 = unlimited")
+    parser.add_argument("--capacity", type=int, default=0, help="concurrent downloads before 503, 0 = unlimited")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of downloads answered 500")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per combination, the median one is reported")
+    parser.add_argument("--out", default=None, help="results directory, default a new temp directory")
+    args = parser.parse_args()
+
+    file_counts = [int(n) for n in args.files.split(",")]
+    out = args.out or tempfile.mkdtemp(prefix="ingest_suite_")
+    os.makedirs(out, exist_ok=True)
+    folder = FOLDERS[args.dataset]
+
+    rows = []
+    with tempfile.TemporaryDirectory() as src_dir, tempfile.TemporaryDirectory() as workdir:
+        start = time.perf_counter()
+        # Every run lists the same archives and takes the newest `files` of them
+        make_dataset(os.path.join(src_dir, folder), args.dataset, max(file_counts))
+        print(f"Generated {max(file_counts)} {args.dataset} archives in {time.perf_counter() - start:.1f}s")
+        base_url, server = serve_directory(src_dir, delay=args.latency, capacity=args.capacity,
+                                           bandwidth=args.bandwidth, error_rate=args.error_rate)
+        scraping_module.GITHUB_API = base_url.rstrip("/")
+        try:
+            for source in args.source.split(","):
+                url = source_url(source, base_url, folder)
+                for files in file_counts:
+                    for workers in args.workers.split(","):
+                        for codec in args.codecs.split(","):
+                            runs = [run_once(url, folder, files, workers, codec, args.store, workdir)
+                                    for _ in range(args.repeat)]
+                            # The median run by wall time, with its own profile and log
+                            values, sampler, log = sorted(runs, key=lambda run: run[0][0])[len(runs) // 2]
+                            wall, ingested, mb_in, mb_out, retries, cpu = values
+                            label = f"{source}-{args.store}-{files}f-{workers}w-{codec}"
+                            sampler.write(os.path.join(out, label + ".folded"))
+                            with open(os.path.join(out, label + ".log"), "w") as f:
+                                f.write(log.getvalue())
+                            rows.append((source, args.store, files, workers, codec, round(wall, 3), ingested,
+                                         round(mb_in, 2), round(mb_out, 2), round(mb_in / wall, 2), retries,
+                                         round(cpu, 2)))
+                            print(f"{label}: {wall:.2f}s, {ingested} files")
+        finally:
+            server.shutdown()
+            scraping_module.GITHUB_API = "https://api.github.com"
+
+    with open(os.path.join(out, "results.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        writer.writerows(rows)
+
+    print(f"\n{args.dataset}, {args.latency}s latency, bandwidth {args.bandwidth or 'unlimited'}, "
+          f"error rate {args.error_rate}, {args.store} store\n")
+    print(f"{'source':<8}{'files':>6}{'workers':>10}{'codec':>6}{'wall s':>9}{'ingested':>10}{'MB in':>8}"
+          f"{'MB out':>8}{'MB/s':>7}{'retries':>9}{'cpu s':>7}")
+    for source, _, files, workers, codec, wall, ingested, mb_in, mb_out, rate, retries, cpu in rows:
+        print(f"{source:<8}{files:>6}{workers:>10}{codec:>6}{wall:>9.2f}{ingested:>10}{mb_in:>8.2f}"
+              f"{mb_out:>8.2f}{rate:>7.2f}{retries:>9}{cpu:>7.2f}")
+    print(f"\nresults.csv and .folded profiles in {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Multi-process stress test for DownloadManifest commits on a local filesystem store.
+
+Several processes append to the same folder at once, with a merge threshold
+low enough that almost every append races another process's merge, while also
+racing the one-time import of a legacy download_log.csv. Afterwards every
+entry written by every process must be visible, both through a fresh
+DownloadManifest lookup and through the '*/*.csv' glob the SQL models read.
+
+    python orchestration/benchmark/manifest_stress.py --processes 8 --rounds 25
+"""
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "new"))
+
+import obstore
+from obstore.store import LocalStore
+
+from scraping import DownloadManifest, parse_log_lines
+
+FOLDER = "Reports/Current/Dispatch_SCADA/"
+LEGACY = [f"PUBLIC_DISPATCHSCADA_20240930{i:04d}_legacy.zip" for i in range(50)]
+
+
+def entry_names(worker: int, round_: int, batch: int):
+    # Spread over two months so commits hit more than one partition
+    for i in range(batch):
+        month = "10" if (round_ + i) % 2 else "11"
+        yield f"PUBLIC_DISPATCHSCADA_2024{month}{worker + 1:02d}{round_:04d}{i:02d}_w{worker}.zip"
+
+
+def worker(root: str, worker_id: int, rounds: int, batch: int, merge_threshold: int, start) -> None:
+    store = LocalStore(root)
+    start.wait()
+    for round_ in range(rounds):
+        manifest = DownloadManifest(store, FOLDER, merge_threshold=merge_threshold)
+        names = list(entry_names(worker_id, round_, batch))
+        manifest.downloaded(names)
+        manifest.append([(n, f"{FOLDER}week=2024_42/{n[:-4]}.CSV.gz") for n in names])
+        # A separate folder per worker commits without contending with anyone
+        DownloadManifest(store, f"{FOLDER}own_{worker_id}/").append([(names[0], "x")])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=25)
+    parser.add_argument("--batch", type=int, default=4)
+    parser.add_argument("--merge-threshold", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        store = LocalStore(root)
+        obstore.put(store, FOLDER + "download_log.csv",
+                    ("zip_filename,extracted_filepath\n" + "\n".join(f"{n},old" for n in LEGACY)).encode())
+
+        ctx = mp.get_context("spawn")
+        start = ctx.Event()
+        procs = [ctx.Process(target=worker, args=(root, w, args.rounds, args.batch, args.merge_threshold, start))
+                 for w in range(args.processes)]
+        for p in procs:
+            p.start()
+        t0 = time.perf_counter()
+        start.set()
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - t0
+        if any(p.exitcode for p in procs):
+            raise SystemExit(f"worker failed: exit codes {[p.exitcode for p in procs]}")
+
+        expected = set(LEGACY)
+        for w in range(args.processes):
+            for r in range(args.rounds):
+                expected.update(entry_names(w, r, args.batch))
+
+        found = DownloadManifest(store, FOLDER).downloaded(sorted(expected))
+        missing = expected - found
+
+        globbed = set()
+        for batch in obstore.list(store, prefix=FOLDER + "download_log/"):
+            for meta in batch:
+                if meta["path"].count("/") == FOLDER.count("/") + 2 and meta["path"].endswith(".csv"):
+                    lines = parse_log_lines(bytes(obstore.get(store, meta["path"]).bytes()).decode())
+                    globbed.update(line.split(",", 1)[0] for line in lines)
+
+        print(f"{args.processes} processes x {args.rounds} rounds in {elapsed:.2f}s: "
+              f"{len(expected)} entries expected, {len(found)} found by lookup, {len(globbed)} in glob")
+        assert not missing, f"{len(missing)} entries lost, e.g. {sorted(missing)[:3]}"
+        assert globbed == expected, f"glob differs: {len(expected - globbed)} missing, {len(globbed - expected)} extra"
+        print("OK: no entry lost")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+Local stand-in for nemweb.com.au used by the ingestion benchmarks.
+
+Generates synthetic AEMO archives on disk (DispatchIS, Dispatch_SCADA and
+Daily_Reports, with their real file name patterns and row counts) and
+serves them from a plain directory listing, which is what `scraping()`
+parses for nemweb URLs, and through a GitHub contents API look-alike under
+/repos/<owner>/<repo>/contents/<path> for GitHub tree URLs (point
+scraping.GITHUB_API at the server). Latency, bandwidth, throttling and
+failures can be injected per server.
+"""
+import datetime
+import json
+import multiprocessing as mp
+import os
+import random
+import re
+import threading
+import time
+import zipfile
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Tuple
+from urllib.parse import quote, unquote, urlparse
+
+MODELS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "new")
+REGIONS = ("NSW1", "QLD1", "SA1", "TAS1", "VIC1")
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    delay = 0.0
+    capacity = 0  # archive downloads served at once before answering 503, 0 = unlimited
+    bandwidth = 0  # bytes per second per response, 0 = unlimited
+    error_rate = 0.0  # share of archive downloads answered 500
+    _inflight = None
+    _rng = None
+    _validators = None
+
+    def do_GET(self):
+        if self.path.startswith("/repos/"):
+            return self.github_contents()
+        if not self.path.endswith(".zip"):
+            return super().do_GET()
+        if self.error_rate:
+            with self._rng[0]:
+                failed = self._rng[1].random() < self.error_rate
+            if failed:
+                self.send_error(500, "Injected failure")
+                return None
+        if self.capacity:
+            with self._inflight[0]:
+                throttled = self._inflight[1] >= self.capacity
+                if not throttled:
+                    self._inflight[1] += 1
+            if throttled:
+                self.send_error(503, "Slow down")
+                return None
+        try:
+            if self.delay:
+                time.sleep(self.delay)
+            super().do_GET()
+        finally:
+            if self.capacity:
+                with self._inflight[0]:
+                    self._inflight[1] -= 1
+
+    def github_contents(self):
+        """GET /repos/<owner>/<repo>/contents/<path>[?ref=]: the served directory as the GitHub contents API."""
+        parts = urlparse(self.path).path.split("/", 5)
+        if len(parts) < 5 or parts[4] != "contents":
+            self.send_error(404, "Not Found")
+            return None
+        folder = unquote(parts[5] if len(parts) > 5 else "").strip("/")
+        local = os.path.join(self.directory, folder)
+        if not os.path.isdir(local):
+            self.send_error(404, "Not Found")
+            return None
+        items = []
+        for name in sorted(os.listdir(local)):
+            path = f"{folder}/{name}" if folder else name
+            is_dir = os.path.isdir(os.path.join(local, name))
+            items.append({"name": name, "path": path, "type": "dir" if is_dir else "file",
+                          "size": 0 if is_dir else os.path.getsize(os.path.join(local, name)),
+                          "download_url": None if is_dir else f"http://{self.headers['Host']}/{quote(path)}"})
+        body = json.dumps(items).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return None
+
+    def copyfile(self, source, outputfile):
+        if not self.bandwidth:
+            return super().copyfile(source, outputfile)
+        # 50 ms slices, each padded to the time it takes at `bandwidth`
+        slice_bytes = max(1, int(self.bandwidth / 20))
+        while block := source.read(slice_bytes):
+            start = time.perf_counter()
+            outputfile.write(block)
+            time.sleep(max(0.0, len(block) / self.bandwidth - (time.perf_counter() - start)))
+        return None
+
+    def list_directory(self, path):
+        # Like nemweb's IIS, validate listings by ETag/Last-Modified so conditional GETs get a 304
+        mtime_ns = os.stat(path).st_mtime_ns
+        etag, last_modified = f'"{mtime_ns:x}"', self.date_time_string(mtime_ns // 10 ** 9)
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match == etag or (if_none_match is None and self.headers.get("If-Modified-Since") == last_modified):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return None
+        self._validators = (etag, last_modified)
+        return super().list_directory(path)
+
+    def end_headers(self):
+        if self._validators:
+            self.send_header("ETag", self._validators[0])
+            self.send_header("Last-Modified", self._validators[1])
+            self._validators = None
+        super().end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    # The socketserver default backlog of 5 resets connections under benchmark concurrency
+    request_queue_size = 128
+
+
+def dunit_rows(settlement: datetime.datetime, n_rows: int, seed: int = 0):
+    """Yield DUNIT rows shaped like the Daily_Reports files read by scada.sql."""
+    rng = random.Random(seed)
+    ts = settlement.strftime("%Y/%m/%d %H:%M:%S")
+    yield "C,NEMP.WORLD,DAILY,AEMO,PUBLIC,,,\n"
+    yield "I,DUNIT,,3,SETTLEMENTDATE,RUNNO,DUID,INTERVENTION,DISPATCHMODE,AGCSTATUS,INITIALMW,TOTALCLEARED\n"
+    for i in range(n_rows):
+        yield (f'D,DUNIT,,3,"{ts}",1,DUID{i % 500:04d},0,0,1,'
+               f"{rng.uniform(0, 700):.5f},{rng.uniform(0, 700):.5f}\n")
+
+
+def unit_scada_rows(settlement: datetime.datetime, n_rows: int, seed: int = 0):
+    """Yield UNIT_SCADA rows shaped like the Dispatch_SCADA files read by scada_today.sql."""
+    rng = random.Random(seed)
+    ts = settlement.strftime("%Y/%m/%d %H:%M:%S")
+    yield "C,NEMP.WORLD,DISPATCHSCADA,AEMO,PUBLIC,,,\n"
+    yield "I,DISPATCH,UNIT_SCADA,1,SETTLEMENTDATE,DUID,SCADAVALUE,LASTCHANGED\n"
+    for i in range(n_rows):
+        yield f'D,DISPATCH,UNIT_SCADA,1,"{ts}",DUID{i % 500:04d},{rng.uniform(0, 700):.5f},"{ts}"\n'
+
+
+def make_archive(directory: str, zip_name: str, member_name: str, member_bytes: int, seed: int = 0,
+                 rows=dunit_rows) -> str:
+    """Write `zip_name` with one CSV member of roughly `member_bytes`, streaming to disk."""
+    path = os.path.join(directory, zip_name)
+    settlement = datetime.datetime(2024, 10, 18, 4, 5)
+    written = 0
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        with zf.open(member_name, "w", force_zip64=True) as member:
+            rows = rows(settlement, n_rows=1 << 62, seed=seed)
+            while written < member_bytes:
+                line = next(rows).encode()
+                member.write(line)
+                written += len(line)
+    return path
+
+
+def serve_directory(directory: str, delay: float = 0.0, capacity: int = 0, bandwidth: int = 0,
+                    error_rate: float = 0.0, seed: int = 0) -> Tuple[str, ThreadingHTTPServer]:
+    """Serve `directory` on a free localhost port; returns (base_url, server).
+
+    `delay` adds a fixed latency in seconds to every archive download.
+    `capacity` > 0 throttles like a busy nemweb: archive requests beyond that
+    many in flight get an immediate 503.
+    `bandwidth` > 0 caps every response at that many bytes per second.
+    `error_rate` answers that share of archive downloads with a 500, drawn
+    from a generator seeded with `seed` so sweeps see the same failures.
+    """
+    attrs = {"delay": delay, "capacity": capacity, "bandwidth": bandwidth, "error_rate": error_rate,
+             "_inflight": [threading.Lock(), 0], "_rng": (threading.Lock(), random.Random(seed))}
+    handler = partial(type("_DelayedHandler", (_QuietHandler,), attrs), directory=directory)
+    server = _Server(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/", server
+
+
+def make_scada_day(directory: str, n_files: int, member_bytes: int = 40 * 1024, day: str = "20241018") -> None:
+    """Write `n_files` 5-minute PUBLIC_DISPATCHSCADA archives for one day into `directory`."""
+    os.makedirs(directory, exist_ok=True)
+    for i in range(n_files):
+        stamp = f"{day}{i * 5 // 60 % 24:02d}{i * 5 % 60:02d}"
+        name = f"PUBLIC_DISPATCHSCADA_{stamp}_0000000{439000000 + i}"
+        make_archive(directory, name + ".zip", name + ".CSV", member_bytes, seed=i, rows=unit_scada_rows)
+
+
+def model_columns(table: str) -> List[str]:
+    """I-row column names of a CSV model, i.e. its columns dict without I,<REPORT>,<SUBREPORT>,<VERSION>."""
+    with open(os.path.join(MODELS, f"{table}.sql")) as f:
+        return re.findall(r"'(\w+)'\s*:\s*'VARCHAR'", f.read())[4:]
+
+
+def section(report: str, sub_report: str, columns, keys, intervals: int, rng: random.Random,
+            start: datetime.datetime, version: int = 3):
+    """Yield the I row and `intervals` x `keys` D rows of one AEMO record type; keys fill REGIONID/DUID."""
+    yield f"I,{report},{sub_report},{version},{','.join(columns)}\n"
+    for n in range(intervals):
+        ts = (start + datetime.timedelta(minutes=5 * n)).strftime("%Y/%m/%d %H:%M:%S")
+        for key in keys:
+            values = []
+            for column in columns:
+                if column in ("SETTLEMENTDATE", "LASTCHANGED"):
+                    values.append(f'"{ts}"')
+                elif column in ("REGIONID", "DUID", "CONSTRAINTID", "INTERCONNECTORID"):
+                    values.append(key)
+                else:
+                    values.append(f"{rng.uniform(-100, 700):.5f}")
+            yield f"D,{report},{sub_report},{version},{','.join(values)}\n"
+
+
+def _write_archive(directory: str, name: str, sections) -> str:
+    path = os.path.join(directory, name + ".zip")
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        with zf.open(name + ".CSV", "w", force_zip64=True) as member:
+            member.write(b"C,NEMP.WORLD,REPORT,AEMO,PUBLIC,,,\n")
+            for lines in sections:
+                for line in lines:
+                    member.write(line.encode())
+            member.write(b"C,END OF REPORT\n")
+    return path
+
+
+def make_daily(directory: str, index: int, intervals: int = 288, units: int = 450) -> str:
+    """
+    PUBLIC_DAILY_<day>0000_<id>.zip for 1 Oct 2024 + `index` days: DREGION
+    and DUNIT sections with the full column sets price.sql and scada.sql
+    declare (5 regions and `units` DUIDs per 5-minute interval, a real day
+    being 288 intervals and about 450 units), plus an unrelated record type.
+    """
+    day = datetime.datetime(2024, 10, 1) + datetime.timedelta(days=index)
+    rng = random.Random(index)
+    duids = [f"DUID{u:04d}" for u in range(units)]
+    return _write_archive(directory, f"PUBLIC_DAILY_{day:%Y%m%d}0000_{20241019040503 + index}", (
+        section("DREGION", "", model_columns("price"), REGIONS, intervals, rng, day),
+        section("DUNIT", "", model_columns("scada"), duids, intervals, rng, day),
+        section("DINTERCONNECTOR", "", ["SETTLEMENTDATE", "RUNNO", "INTERCONNECTORID", "MWFLOW"],
+                ["N-Q-MNSP1", "NSW1-QLD1", "T-V-MNSP1", "V-S-MNSP1", "V-SA", "VIC1-NSW1"], intervals, rng, day)))
+
+
+def make_dispatchis(directory: str, index: int, constraints: int = 900) -> str:
+    """
+    PUBLIC_DISPATCHIS_<interval>_<id>.zip for the 5-minute interval `index`
+    of 18 Oct 2024: DISPATCH,PRICE with the columns price_today.sql declares
+    and DISPATCH,REGIONSUM for the 5 regions, interconnector flows and about
+    `constraints` binding constraint rows, which dominate the real files.
+    """
+    interval = datetime.datetime(2024, 10, 18) + datetime.timedelta(minutes=5 * (index + 1))
+    rng = random.Random(index)
+    return _write_archive(directory, f"PUBLIC_DISPATCHIS_{interval:%Y%m%d%H%M}_0000000{438000000 + index}", (
+        section("DISPATCH", "PRICE", model_columns("price_today"), REGIONS, 1, rng, interval, 5),
+        section("DISPATCH", "REGIONSUM", ["SETTLEMENTDATE", "RUNNO", "REGIONID", "TOTALDEMAND",
+                                           "AVAILABLEGENERATION", "NETINTERCHANGE"], REGIONS, 1, rng, interval, 9),
+        section("DISPATCH", "INTERCONNECTORRES", ["SETTLEMENTDATE", "RUNNO", "INTERCONNECTORID", "MWFLOW",
+                                                   "MWLOSSES"], ["N-Q-MNSP1", "NSW1-QLD1", "T-V-MNSP1",
+                                                                 "V-S-MNSP1", "V-SA", "VIC1-NSW1"], 1, rng, interval),
+        section("DISPATCH", "CONSTRAINT", ["SETTLEMENTDATE", "RUNNO", "CONSTRAINTID", "RHS", "MARGINALVALUE",
+                                           "VIOLATIONDEGREE", "LASTCHANGED"],
+                [f"CONSTRAINT{c:04d}" for c in range(constraints)], 1, rng, interval, 5)))
+
+
+def make_dataset(directory: str, kind: str, n_files: int) -> List[str]:
+    """Write `n_files` archives of `kind` ("dispatchis", "scada" or "daily") into `directory`; returns the zip names."""
+    os.makedirs(directory, exist_ok=True)
+    if kind == "dispatchis":
+        paths = [make_dispatchis(directory, i) for i in range(n_files)]
+    elif kind == "daily":
+        paths = [make_daily(directory, i) for i in range(n_files)]
+    elif kind == "scada":
+        make_scada_day(directory, n_files)
+        paths = [p for p in os.listdir(directory) if p.startswith("PUBLIC_DISPATCHSCADA_")]
+    else:
+        raise ValueError(f"Unknown dataset '{kind}', use dispatchis, scada or daily")
+    return sorted(os.path.basename(p) for p in paths if p.endswith(".zip"))
+
+
+def _serve_forever(directory: str, delay: float, port_queue) -> None:
+    base_url, server = serve_directory(directory, delay)
+    port_queue.put(base_url)
+    threading.Event().wait()
+
+
+def serve_directory_process(directory: str, delay: float = 0.0) -> Tuple[str, mp.Process]:
+    """Like serve_directory, but in a child process so its CPU time and threads are not counted."""
+    ctx = mp.get_context("spawn")
+    port_queue = ctx.Queue()
+    proc = ctx.Process(target=_serve_forever, args=(directory, delay, port_queue), daemon=True)
+    proc.start()
+    return port_queue.get(), proc
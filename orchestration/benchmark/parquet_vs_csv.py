@@ -0,0 +1,100 @@
+"""
+End-to-end price + scada comparison of the two landing formats of scraping().
+
+Serves synthetic Daily_Reports archives (DREGION and DUNIT sections with the
+full column sets price.sql and scada.sql declare, plus an unrelated record
+type), ingests them once with output_format="csv" and once with "parquet"
+into a LocalStore each, then runs price/scada and their __parquet variants
+against the landed files. Reports ingest time, landed objects and bytes, and
+model time, and checks both formats produce the same rows.
+
+    python orchestration/benchmark/parquet_vs_csv.py --files 8 --intervals 288
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, "..", "new"))
+
+import duckdb
+from obstore.store import LocalStore
+
+from nemweb_stub import make_daily, serve_directory
+from scraping import scraping
+
+MODELS = os.path.join(HERE, "..", "new")
+FOLDER = "Reports/Current/Daily_Reports/"
+FILES_URL = "abfss://$ws@onelake.dfs.fabric.microsoft.com/$lh.Lakehouse/Files/"
+
+
+def landed(root: str):
+    sizes = [os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(root) for f in files
+             if "download_log" not in d]
+    return len(sizes), sum(sizes)
+
+
+def run_model(root: str, table: str, variant: str):
+    name = f"{table}__{variant}" if variant else table
+    with open(os.path.join(MODELS, f"{name}.sql")) as f:
+        script = f.read().replace(FILES_URL, root.rstrip("/") + "/")
+    con = duckdb.connect()
+    start = time.perf_counter()
+    result = con.sql(script).fetch_arrow_table()
+    elapsed = time.perf_counter() - start
+    con.close()
+    return result, elapsed
+
+
+def rows(table):
+    # file names differ by format (.CSV.gz vs .parquet); everything else must match
+    return sorted(tuple(row.values()) for row in table.drop_columns(["file"]).to_pylist())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--intervals", type=int, default=288, help="5-minute intervals per file")
+    parser.add_argument("--units", type=int, default=100, help="DUNIT rows per interval")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as src_dir, tempfile.TemporaryDirectory() as out_dir:
+        for i in range(args.files):
+            make_daily(src_dir, i, args.intervals, args.units)
+        base_url, server = serve_directory(src_dir)
+        results = {}
+        try:
+            for output_format in ("csv", "parquet"):
+                root = os.path.join(out_dir, output_format)
+                os.makedirs(root)
+                start = time.perf_counter()
+                scraping([base_url], [FOLDER], args.files, "ws", "lh", args.workers, store=LocalStore(root),
+                         watermark=False, output_format=output_format)
+                ingest = time.perf_counter() - start
+                objects, size = landed(root)
+                variant = "parquet" if output_format == "parquet" else None
+                price, price_s = run_model(root, "price", variant)
+                scada, scada_s = run_model(root, "scada", variant)
+                results[output_format] = (ingest, objects, size, price, price_s, scada, scada_s)
+        finally:
+            server.shutdown()
+
+    print(f"\n{args.files} Daily_Reports files, {args.intervals} intervals, {args.units} units\n")
+    print(f"{'format':<9}{'ingest s':>10}{'objects':>9}{'MB':>8}{'price s':>9}{'scada s':>9}{'rows':>10}")
+    for output_format, (ingest, objects, size, price, price_s, scada, scada_s) in results.items():
+        print(f"{output_format:<9}{ingest:>10.2f}{objects:>9}{size / 1e6:>8.2f}{price_s:>9.3f}{scada_s:>9.3f}"
+              f"{price.num_rows + scada.num_rows:>10}")
+
+    csv_run, parquet_run = results["csv"], results["parquet"]
+    for label, i in (("price", 3), ("scada", 5)):
+        if csv_run[i].schema.names != parquet_run[i].schema.names or rows(csv_run[i]) != rows(parquet_run[i]):
+            raise SystemExit(f"{label}: the csv and parquet models disagree")
+    print("\nprice and scada match between formats")
+
+
+if __name__ == "__main__":
+    main()
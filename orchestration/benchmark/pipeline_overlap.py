@@ -0,0 +1,79 @@
+"""
+Wall-time benchmark for the fetch -> recompress -> upload pipeline in scraping().
+
+Serves synthetic DispatchIS archives with a fixed per-download latency and
+wraps the store with a fixed per-upload latency. With the stages overlapped,
+a run where both latencies are present should take close to the slower of the
+two single-latency runs, not their sum.
+
+    python orchestration/benchmark/pipeline_overlap.py --files 60 --latency 0.2
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, "..", "new"))
+
+from obstore.store import MemoryStore
+
+import scraping as scraping_module
+from nemweb_stub import make_archive, serve_directory
+from storage import ObstoreBackend
+
+
+class SlowBackend(ObstoreBackend):
+    """Storage backend whose put() takes at least `upload_latency` seconds."""
+
+    def __init__(self, store, upload_latency: float):
+        super().__init__(store)
+        self.upload_latency = upload_latency
+
+    def put(self, path: str, data: bytes, mode: str = "overwrite") -> None:
+        time.sleep(self.upload_latency)
+        super().put(path, data, mode)
+
+
+def run(src_dir: str, files: int, download_latency: float, upload_latency: float) -> float:
+    base_url, server = serve_directory(src_dir, delay=download_latency)
+    try:
+        start = time.perf_counter()
+        result = scraping_module.scraping([base_url], ["Reports/Current/DispatchIS_Reports/"], files,
+                                          "ws", "lh", 1, store=SlowBackend(MemoryStore(), upload_latency))
+        elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+    if result != 1:
+        raise SystemExit("scraping() did not ingest any file")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=60)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per download and per upload")
+    parser.add_argument("--member-kb", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as src_dir:
+        for i in range(args.files):
+            stamp = f"20241018{i // 12:02d}{i % 12 * 5:02d}"
+            make_archive(src_dir, f"PUBLIC_DISPATCHIS_{stamp}_0000000438{i:06d}.zip",
+                         f"PUBLIC_DISPATCHIS_{stamp}_0000000438{i:06d}.CSV", args.member_kb * 1024, seed=i)
+
+        download_only = run(src_dir, args.files, args.latency, 0.0)
+        upload_only = run(src_dir, args.files, 0.0, args.latency)
+        both = run(src_dir, args.files, args.latency, args.latency)
+
+    print(f"download latency only : {download_only:6.2f}s")
+    print(f"upload latency only   : {upload_only:6.2f}s")
+    print(f"both                  : {both:6.2f}s")
+    print(f"  sum of the two      : {download_only + upload_only:6.2f}s")
+    print(f"  max of the two      : {max(download_only, upload_only):6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
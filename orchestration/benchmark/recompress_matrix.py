@@ -0,0 +1,138 @@
+"""
+Codec x level x cores matrix for the recompress stage of scraping().
+
+Recompresses synthetic Daily_Reports archives the way the pipeline does
+(8 stage threads handing archives to a process pool of `cores` workers, or
+recompressing on the threads themselves when cores is 0) and reports, per
+combination: wall time, CPU seconds (this process plus the time spent in
+the pool workers),
+output bytes, and the time DuckDB's read_csv takes to scan the output with
+the settings scada.sql uses.
+
+    python orchestration/benchmark/recompress_matrix.py --files 16 --member-mb 4
+    python orchestration/benchmark/recompress_matrix.py --codecs zstd --levels 1,3,9 --cores 0,2,4
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, "..", "new"))
+
+import duckdb
+
+from nemweb_stub import make_archive
+from scraping import CODECS, recompress_archive_bytes, recompress_pool
+
+CHUNK_SIZE = 8 * 1024 * 1024
+DEFAULT_LEVELS = {"gzip": "1,6,9", "zstd": "1,3,9,19"}
+
+SCAN_SQL = """
+SELECT count(*), sum(CAST(INITIALMW AS DOUBLE))
+FROM read_csv({files}, skip = 1, header = 0, all_varchar = 1, null_padding = true, ignore_errors = 1,
+              auto_detect = false, filename = 1,
+              columns = {{'I': 'VARCHAR', 'UNIT': 'VARCHAR', 'XX': 'VARCHAR', 'VERSION': 'VARCHAR',
+                         'SETTLEMENTDATE': 'VARCHAR', 'RUNNO': 'VARCHAR', 'DUID': 'VARCHAR',
+                         'INTERVENTION': 'VARCHAR', 'DISPATCHMODE': 'VARCHAR', 'AGCSTATUS': 'VARCHAR',
+                         'INITIALMW': 'VARCHAR', 'TOTALCLEARED': 'VARCHAR'}})
+WHERE I = 'D' AND UNIT = 'DUNIT'
+"""
+
+
+def cpu_seconds() -> float:
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    return own.ru_utime + own.ru_stime
+
+
+def recompress_timed(*args):
+    """recompress_archive_bytes() and the CPU seconds it took, from inside a pool worker."""
+    start = time.process_time()
+    members = recompress_archive_bytes(*args)
+    return members, time.process_time() - start
+
+
+def recompress_all(archives, codec: str, level: int, cores: int):
+    """Recompress every archive; returns (members, wall seconds, cpu seconds)."""
+    start_cpu, start = cpu_seconds(), time.perf_counter()
+    # Created inside the measurement so starting the workers is part of the cost
+    processes = recompress_pool(cores)
+
+    def recompress(item):
+        filename, archive = item
+        if processes is None:
+            return recompress_archive_bytes("Daily/", filename, archive, CHUNK_SIZE, codec, level), 0.0
+        # Workers are forkserver children, not ours, so they report their own CPU time
+        return processes.submit(recompress_timed, "Daily/", filename, archive, CHUNK_SIZE, codec, level).result()
+
+    try:
+        with ThreadPoolExecutor(max_workers=8) as stage:
+            results = list(stage.map(recompress, archives))
+    finally:
+        if processes is not None:
+            processes.shutdown()
+    members = [m for result, _ in results for m in result]
+    worker_cpu = sum(cpu for _, cpu in results)
+    return members, time.perf_counter() - start, cpu_seconds() - start_cpu + worker_cpu
+
+
+def scan_seconds(out_dir: str, members) -> float:
+    files = []
+    for path, data, _ in members:
+        target = os.path.join(out_dir, os.path.basename(path))
+        with open(target, "wb") as f:
+            f.write(data)
+        files.append(target)
+    con = duckdb.connect()
+    start = time.perf_counter()
+    con.sql(SCAN_SQL.format(files=files)).fetchall()
+    elapsed = time.perf_counter() - start
+    con.close()
+    for target in files:
+        os.remove(target)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=16)
+    parser.add_argument("--member-mb", type=float, default=4)
+    parser.add_argument("--codecs", default="gzip,zstd")
+    parser.add_argument("--levels", default=None, help="comma separated, default depends on the codec")
+    parser.add_argument("--cores", default=None, help="comma separated pool sizes, 0 = stage threads only")
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    cores = [int(c) for c in (args.cores or ",".join(sorted({"0", "1", str(cpus)}))).split(",")]
+
+    with tempfile.TemporaryDirectory() as src_dir, tempfile.TemporaryDirectory() as out_dir:
+        archives = []
+        for i in range(args.files):
+            name = f"PUBLIC_DAILY_202410{i % 28 + 1:02d}0000_{20241019040503 + i}"
+            path = make_archive(src_dir, name + ".zip", name + ".CSV", int(args.member_mb * 1024 * 1024), seed=i)
+            with open(path, "rb") as f:
+                archives.append((name + ".zip", f.read()))
+        raw_bytes = args.files * int(args.member_mb * 1024 * 1024)
+        print(f"{args.files} archives, {raw_bytes / 1e6:.0f} MB of CSV, {cpus} CPU(s) available\n")
+
+        print(f"{'codec':<6}{'level':>6}{'cores':>6}{'wall s':>9}{'cpu s':>9}{'MB out':>9}{'ratio':>8}{'scan s':>9}")
+        for codec in args.codecs.split(","):
+            if codec not in CODECS:
+                raise SystemExit(f"Unknown codec '{codec}', use one of {sorted(CODECS)}")
+            for level in (int(v) for v in (args.levels or DEFAULT_LEVELS[codec]).split(",")):
+                scan = None
+                for n in cores:
+                    members, wall, cpu = recompress_all(archives, codec, level, n)
+                    out_bytes = sum(len(data) for _, data, _ in members)
+                    if scan is None:  # the output does not depend on the pool size
+                        scan = scan_seconds(out_dir, members)
+                    print(f"{codec:<6}{level:>6}{n:>6}{wall:>9.2f}{cpu:>9.2f}{out_bytes / 1e6:>9.1f}"
+                          f"{raw_bytes / out_bytes:>8.1f}{scan:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
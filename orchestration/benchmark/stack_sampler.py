@@ -0,0 +1,71 @@
+"""
+Wall-clock stack sampler for the ingestion benchmarks.
+
+cProfile only sees the thread that started it, while scraping() spends its
+time in pool threads. StackSampler samples every thread of this process at
+a fixed interval and writes the stacks in the folded format
+("thread;outer;...;inner count" per line) that flamegraph.pl, inferno and
+speedscope read. Threads waiting on I/O or locks are sampled too, so the
+graph shows where wall time goes, not only CPU. Recompress pool processes
+are not sampled; their cost shows as the future wait in the stage thread.
+
+    with StackSampler() as sampler:
+        scraping(...)
+    sampler.write("run.folded")
+"""
+import re
+import sys
+import threading
+from collections import Counter
+
+
+class StackSampler:
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples = 0
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _label(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})"
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            # Pool threads are named <pool>_<n>; one flame per pool, not per thread
+            names = {t.ident: re.sub(r"_\d+$", "", t.name) for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, "thread"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def __enter__(self) -> "StackSampler":
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def top(self, n: int = 5):
+        """The `n` innermost frames with the most samples, as (frame, samples)."""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(n)
+
+    def write(self, path: str) -> None:
+        with open(path, "w") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
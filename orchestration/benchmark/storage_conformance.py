@@ -0,0 +1,252 @@
+"""
+Conformance and throughput suite for the storage backends (storage.py).
+
+Runs the same checks against every backend the ingestion engine can use:
+obstore over a MemoryStore and a LocalStore, LocalBackend, and
+FabricFilesBackend over datalake_stub's in-memory lakehouse connection
+(skipped if azure-core is not installed). The checks are the contract
+scraping() relies on: round trips, FileNotFoundError for missing objects,
+atomic create-only puts (one winner out of racing writers), prefix listing,
+multipart writers that leave nothing behind on error, and put_async.
+
+Then, per backend: put/get/head throughput of small objects from a thread
+pool, a multipart upload of one large object, and, with --ingest-files, a
+scraping() run of synthetic DispatchIS archives from a local nemweb stand-in.
+
+    python orchestration/benchmark/storage_conformance.py
+    python orchestration/benchmark/storage_conformance.py --backends local,fabric --objects 2000 \
+        --threads 16 --fabric-latency 0.005 --ingest-files 60
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, "..", "new"))
+
+from obstore.store import LocalStore, MemoryStore
+
+from storage import AlreadyExistsError, FabricFilesBackend, LocalBackend, ObstoreBackend
+
+BACKENDS = ("memory", "obstore-local", "local", "fabric")
+FOLDER = "Reports/Current/DispatchIS_Reports/"
+
+
+def make_backend(kind: str, workdir: str, fabric_latency: float):
+    if kind == "memory":
+        return ObstoreBackend(MemoryStore())
+    if kind == "obstore-local":
+        return ObstoreBackend(LocalStore(tempfile.mkdtemp(dir=workdir)))
+    if kind == "local":
+        return LocalBackend(tempfile.mkdtemp(dir=workdir))
+    from datalake_stub import DataLakeStub
+    return FabricFilesBackend(DataLakeStub(latency=fabric_latency))
+
+
+def raises(exception, call, *args) -> bool:
+    try:
+        call(*args)
+    except exception:
+        return True
+    return False
+
+
+def check_round_trip(backend) -> None:
+    data = os.urandom(100_000)
+    backend.put("rt/a.bin", data)
+    assert backend.get("rt/a.bin") == data
+    assert backend.head("rt/a.bin")["size"] == len(data)
+    backend.put("rt/empty.bin", b"")
+    assert backend.get("rt/empty.bin") == b""
+
+
+def check_missing(backend) -> None:
+    assert raises(FileNotFoundError, backend.get, "missing/a.bin")
+    assert raises(FileNotFoundError, backend.head, "missing/a.bin")
+    assert list(backend.list("missing/")) == []
+
+
+def check_overwrite(backend) -> None:
+    backend.put("ow/a.txt", b"one")
+    backend.put("ow/a.txt", b"two")
+    assert backend.get("ow/a.txt") == b"two"
+
+
+def check_create_only(backend) -> None:
+    backend.put("cp/a.txt", b"first", mode="create")
+    assert raises(AlreadyExistsError, backend.put, "cp/a.txt", b"second", "create")
+    assert backend.get("cp/a.txt") == b"first"
+
+
+def check_create_race(backend) -> None:
+    """Racing create-only puts of one path (the manifest snapshot commit): exactly one wins."""
+    barrier = threading.Barrier(8)
+
+    def create(n: int) -> bool:
+        barrier.wait()
+        try:
+            backend.put("race/snapshot-00000001.csv", f"writer {n}".encode(), mode="create")
+            return True
+        except AlreadyExistsError:
+            return False
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        won = [n for n, ok in enumerate(pool.map(create, range(8))) if ok]
+    assert len(won) == 1, f"{len(won)} writers created the same object"
+    assert backend.get("race/snapshot-00000001.csv") == f"writer {won[0]}".encode()
+
+
+def check_list(backend) -> None:
+    for path in ("ls/month=202401/part-1.csv", "ls/month=202401/part-2.csv", "ls/month=202402/part-1.csv",
+                 "ls/month=202401x/part-1.csv", "lsx/part-1.csv"):
+        backend.put(path, path.encode())
+    listed = {meta["path"]: meta["size"] for meta in backend.list("ls/month=202401/")}
+    expected = ("ls/month=202401/part-1.csv", "ls/month=202401/part-2.csv")
+    assert listed == {path: len(path) for path in expected}, listed
+    assert len(list(backend.list("ls/"))) == 4
+
+
+def check_delete(backend) -> None:
+    backend.put("del/a.txt", b"x")
+    backend.delete("del/a.txt")
+    assert raises(FileNotFoundError, backend.get, "del/a.txt")
+    assert list(backend.list("del/")) == []
+
+
+def check_writer(backend) -> None:
+    """A writer with parts smaller than the object, fed in writes that do not line up with them."""
+    data = os.urandom(5 * 1024 * 1024 + 123)
+    with backend.open_writer("mp/big.bin", buffer_size=1024 * 1024) as writer:
+        view = memoryview(data)
+        for start in range(0, len(data), 700_001):
+            writer.write(view[start:start + 700_001].tobytes())
+    assert backend.get("mp/big.bin") == data
+
+
+def check_writer_abort(backend) -> None:
+    with contextlib.suppress(RuntimeError):
+        with backend.open_writer("mp/aborted.bin", buffer_size=1024 * 1024) as writer:
+            writer.write(os.urandom(3 * 1024 * 1024))
+            raise RuntimeError("member failed to decompress")
+    assert raises(FileNotFoundError, backend.head, "mp/aborted.bin")
+    assert "mp/aborted.bin" not in [meta["path"] for meta in backend.list("mp/")]
+
+
+def check_put_async(backend) -> None:
+    async def put_all():
+        await asyncio.gather(*(backend.put_async(f"async/{n}.txt", str(n).encode()) for n in range(16)))
+    asyncio.run(put_all())
+    assert all(backend.get(f"async/{n}.txt") == str(n).encode() for n in range(16))
+
+
+CHECKS = (check_round_trip, check_missing, check_overwrite, check_create_only, check_create_race, check_list,
+          check_delete, check_writer, check_writer_abort, check_put_async)
+
+
+def conformance(backend) -> list:
+    """Names and errors of the failed checks."""
+    failed = []
+    for check in CHECKS:
+        try:
+            check(backend)
+        except Exception as e:
+            failed.append((check.__name__, f"{type(e).__name__}: {e}"))
+            traceback.print_exc()
+    return failed
+
+
+def throughput(backend, objects: int, object_bytes: int, threads: int, large_mb: int) -> dict:
+    """Objects/s of put, get and head from `threads` threads, and MB/s of one multipart upload."""
+    payload = os.urandom(object_bytes)
+    paths = [f"tp/week=2024_{n % 52:02d}/PUBLIC_DISPATCHIS_{n:06d}.CSV.gz" for n in range(objects)]
+    rates = {}
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for name, call in (("put", lambda p: backend.put(p, payload)), ("get", backend.get),
+                           ("head", backend.head)):
+            start = time.perf_counter()
+            list(pool.map(call, paths))
+            rates[name] = objects / (time.perf_counter() - start)
+    start = time.perf_counter()
+    listed = sum(1 for _ in backend.list("tp/"))
+    rates["list"] = listed / (time.perf_counter() - start)
+    chunk = os.urandom(1024 * 1024)
+    start = time.perf_counter()
+    with backend.open_writer("tp/large.bin", buffer_size=8 * 1024 * 1024) as writer:
+        for _ in range(large_mb):
+            writer.write(chunk)
+    rates["multipart_mb_s"] = large_mb / (time.perf_counter() - start)
+    return rates
+
+
+def ingest(backend, files: int, latency: float) -> tuple:
+    """(wall seconds, files ingested) of a scraping() run into `backend`."""
+    from nemweb_stub import make_dataset, serve_directory
+    from scraping import scraping
+
+    with tempfile.TemporaryDirectory() as src_dir:
+        make_dataset(os.path.join(src_dir, FOLDER), "dispatchis", files)
+        base_url, server = serve_directory(src_dir, delay=latency)
+        try:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = scraping([base_url + FOLDER], [FOLDER], files, "ws", "lh", 1, store=backend)
+            return time.perf_counter() - start, result.metrics.files
+        finally:
+            server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="comma separated: " + ", ".join(BACKENDS))
+    parser.add_argument("--objects", type=int, default=500, help="small objects per throughput phase")
+    parser.add_argument("--object-kb", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--large-mb", type=int, default=64, help="size of the multipart upload")
+    parser.add_argument("--fabric-latency", type=float, default=0.0, help="seconds added to every stub call")
+    parser.add_argument("--ingest-files", type=int, default=0, help="DispatchIS archives per scraping() run")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per archive download")
+    args = parser.parse_args()
+
+    rows, failures = [], 0
+    with tempfile.TemporaryDirectory() as workdir:
+        for kind in args.backends.split(","):
+            try:
+                backend = make_backend(kind, workdir, args.fabric_latency)
+            except ImportError as e:
+                print(f"{kind}: skipped ({e})")
+                continue
+            failed = conformance(backend)
+            failures += len(failed)
+            for name, error in failed:
+                print(f"{kind}: FAILED {name}: {error}")
+            print(f"{kind}: {len(CHECKS) - len(failed)}/{len(CHECKS)} checks passed")
+
+            rates = throughput(make_backend(kind, workdir, args.fabric_latency), args.objects,
+                               args.object_kb * 1024, args.threads, args.large_mb)
+            wall, ingested = (ingest(make_backend(kind, workdir, args.fabric_latency), args.ingest_files,
+                                     args.latency) if args.ingest_files else (None, None))
+            rows.append((kind, len(CHECKS) - len(failed), rates, wall, ingested))
+
+    print(f"\n{args.objects} x {args.object_kb} KB objects from {args.threads} threads, "
+          f"{args.large_mb} MB multipart upload\n")
+    print(f"{'backend':<15}{'checks':>8}{'put/s':>9}{'get/s':>9}{'head/s':>9}{'list/s':>10}{'multipart MB/s':>16}"
+          f"{'ingest s':>10}{'files':>7}")
+    for kind, passed, rates, wall, ingested in rows:
+        ingest_cols = f"{wall:>10.2f}{ingested:>7}" if wall is not None else f"{'-':>10}{'-':>7}"
+        print(f"{kind:<15}{f'{passed}/{len(CHECKS)}':>8}{rates['put']:>9.0f}{rates['get']:>9.0f}"
+              f"{rates['head']:>9.0f}{rates['list']:>10.0f}{rates['multipart_mb_s']:>16.1f}{ingest_cols}")
+    if failures:
+        raise SystemExit(f"{failures} conformance checks failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Peak-RSS benchmark for scraping(streaming=True).
+
+Serves one large synthetic Daily_Reports archive from a local HTTP server and
+ingests it into a LocalStore, once per mode, each in a fresh process so
+ru_maxrss only reflects that run. The streaming run must stay within a budget
+that depends on chunk_size only, not on the archive size.
+
+    python orchestration/benchmark/streaming_memory.py --member-mb 512
+"""
+import argparse
+import multiprocessing as mp
+import os
+import queue as queue_module
+import resource
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, "..", "new"))
+
+from nemweb_stub import make_archive, serve_directory
+
+ZIP_NAME = "PUBLIC_DAILY_202410180000_20241019040503.zip"
+
+
+def _rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run(base_url: str, out_dir: str, streaming: bool, chunk_size: int, queue) -> None:
+    from obstore.store import LocalStore
+    from scraping import scraping
+
+    store = LocalStore(out_dir)
+    baseline = _rss_mb()
+    start = time.perf_counter()
+    result = scraping([base_url], ["Reports/Current/Daily_Reports/"], 1, "ws", "lh", 1,
+                      streaming=streaming, chunk_size=chunk_size, store=store)
+    queue.put((result, time.perf_counter() - start, baseline, _rss_mb()))
+
+
+def measure(base_url: str, streaming: bool, chunk_size: int, timeout: float = 1800):
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    with tempfile.TemporaryDirectory() as out_dir:
+        proc = ctx.Process(target=_run, args=(base_url, out_dir, streaming, chunk_size, queue))
+        proc.start()
+        try:
+            result = queue.get(timeout=timeout)
+        except queue_module.Empty:
+            proc.kill()
+            proc.join()
+            raise SystemExit(f"scraping(streaming={streaming}) sent no result within {timeout:.0f}s "
+                             f"(child exit code {proc.exitcode})")
+        proc.join()
+    if proc.exitcode != 0:
+        raise SystemExit(f"scraping(streaming={streaming}) child exited with code {proc.exitcode}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--member-mb", type=int, default=256, help="uncompressed size of the CSV member")
+    parser.add_argument("--chunk-mb", type=int, default=8)
+    parser.add_argument("--budget-mb", type=int, default=None,
+                        help="allowed RSS growth in streaming mode (default: 8 x chunk + 64)")
+    parser.add_argument("--skip-pipelined", action="store_true", help="only run the streaming mode")
+    args = parser.parse_args()
+
+    chunk_size = args.chunk_mb * 1024 * 1024
+    budget_mb = args.budget_mb or 8 * args.chunk_mb + 64
+
+    with tempfile.TemporaryDirectory() as src_dir:
+        print(f"Generating {args.member_mb} MB archive...")
+        make_archive(src_dir, ZIP_NAME, "PUBLIC_DAILY_202410180000_20241019040503.CSV", args.member_mb * 1024 * 1024)
+        print(f"Archive size: {os.path.getsize(os.path.join(src_dir, ZIP_NAME)) / 1024 / 1024:.1f} MB")
+        base_url, server = serve_directory(src_dir)
+        try:
+            modes = [True] if args.skip_pipelined else [False, True]
+            rows = {}
+            for streaming in modes:
+                result, seconds, baseline, peak = measure(base_url, streaming, chunk_size)
+                if result != 1:
+                    raise SystemExit(f"scraping(streaming={streaming}) returned {result}")
+                rows[streaming] = peak - baseline
+                print(f"{'streaming' if streaming else 'pipelined':9}  {seconds:7.2f}s  "
+                      f"baseline {baseline:7.1f} MB  peak {peak:7.1f} MB  growth {peak - baseline:7.1f} MB")
+        finally:
+            server.shutdown()
+
+    assert rows[True] <= budget_mb, f"streaming RSS growth {rows[True]:.1f} MB exceeds budget {budget_mb} MB"
+    print(f"OK: streaming RSS growth {rows[True]:.1f} MB <= {budget_mb} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # the index is then only safe between threads of one process
+    fcntl = None
+
+INDEX = "index.json"
+
+
+def archive_key(url: str, etag: Optional[str], size: int) -> str:
+    """Cache key of one version of a source archive: sha1 of its URL, ETag and size."""
+    return hashlib.sha1(f"{url}\n{etag or ''}\n{size}".encode("utf-8")).hexdigest()
+
+
+class ArchiveCache:
+    """
+    Local disk cache of source archives, so re-processing and backfills read
+    from local disk instead of nemweb/GitHub.
+
+    Every archive is kept once as <directory>/data/<key>.zip, keyed by its
+    URL, ETag and size (archive_key), and listed in <directory>/index.json
+    with its Last-Modified and last access time. The index is rewritten
+    atomically, merged with what other processes sharing the directory
+    wrote (under a lock file), so the cache survives restarts. Once the
+    archives exceed `max_bytes` the least recently used are deleted; a newer
+    version of a URL replaces the older one.
+
+    With `revalidate` (the default) a cached archive is only served after a
+    conditional GET (If-None-Match/If-Modified-Since) answered 304, so a
+    republished file is fetched again. Without it a URL in the cache is
+    served without any request, which suits nemweb archives: their content
+    never changes under the same name.
+
+    Usage:
+        cache = ArchiveCache("/tmp/archive_cache", max_bytes=20 * 1024 ** 3)
+        cache.download(url, "/tmp/PUBLIC_DISPATCHIS_....zip")
+    or lookup()/request_headers()/current()/open()/add() around your own GET,
+    as scraping() does.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 20 * 1024 ** 3, revalidate: bool = True,
+                 sync_every: int = 64):
+        self.directory = directory
+        self.data = os.path.join(directory, "data")
+        os.makedirs(self.data, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.revalidate = revalidate
+        self.sync_every = sync_every
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._touched = 0
+        self._lock = threading.Lock()
+        self.entries: Dict[str, dict] = {}
+        self._by_url: Dict[str, str] = {}
+        with self._locked():
+            self._sync()
+
+    @contextmanager
+    def _locked(self):
+        """The thread lock plus, where fcntl exists, a lock file shared with other processes."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.directory, ".lock"), "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.data, key + ".zip")
+
+    def _read_index(self) -> Dict[str, dict]:
+        try:
+            with open(os.path.join(self.directory, INDEX)) as f:
+                return json.load(f)["entries"]
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Ignoring unreadable archive cache index {self.directory}: {e}")
+            return {}
+
+    def _remove(self, key: str) -> None:
+        self.entries.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _sync(self, keep: str = None) -> None:
+        """
+        Under the lock: merge with the index on disk, drop entries whose file
+        is gone (evicted elsewhere), keep only the newest version of each URL,
+        evict the least recently used above max_bytes (never `keep`) and
+        write the index back atomically.
+        """
+        for key, entry in self._read_index().items():
+            mine = self.entries.get(key)
+            if mine is None:
+                self.entries[key] = entry
+            else:
+                mine["last_access"] = max(mine["last_access"], entry["last_access"])
+        self.entries = {k: e for k, e in self.entries.items() if os.path.exists(self._path(k))}
+
+        newest = {}
+        for key, entry in sorted(self.entries.items(), key=lambda item: item[1]["stored_at"]):
+            if entry["url"] in newest:
+                self._remove(newest[entry["url"]])
+            newest[entry["url"]] = key
+        total = sum(e["size"] for e in self.entries.values())
+        for key, entry in sorted(self.entries.items(), key=lambda item: item[1]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            if key != keep:
+                self._remove(key)
+                total -= entry["size"]
+                self.evictions += 1
+        self._by_url = {e["url"]: k for k, e in self.entries.items()}
+
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"entries": self.entries}, f)
+            os.replace(tmp, os.path.join(self.directory, INDEX))
+        except BaseException:
+            os.remove(tmp)
+            raise
+        self._touched = 0
+
+    def save(self) -> None:
+        """Persist access times; also runs every `sync_every` hits and on every add()."""
+        with self._locked():
+            self._sync()
+
+    def lookup(self, url: str) -> Optional[dict]:
+        """The cached version of `url`, or None."""
+        with self._lock:
+            key = self._by_url.get(url)
+            return dict(self.entries[key], key=key) if key is not None else None
+
+    def get(self, url: str, etag: Optional[str], size: int) -> Optional[str]:
+        """Local path of exactly this version of `url`, or None."""
+        key = archive_key(url, etag, size)
+        with self._lock:
+            return self._path(key) if key in self.entries else None
+
+    @staticmethod
+    def request_headers(entry: Optional[dict]) -> dict:
+        """Validators for a conditional GET of a cached archive; {} without one."""
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    @staticmethod
+    def current(entry: Optional[dict], status: int, headers) -> bool:
+        """Whether a response to the conditional GET says the cached copy is still the published one."""
+        if entry is None:
+            return False
+        if status == 304:
+            return True
+        # Servers that ignore the validators still tell by the ETag and length of a 200
+        return (status == 200 and bool(entry.get("etag")) and headers.get("ETag") == entry["etag"]
+                and headers.get("Content-Length") == str(entry["size"]))
+
+    def open(self, entry: dict):
+        """Open a cached archive for reading and mark it used; None if it was evicted meanwhile."""
+        try:
+            f = open(self._path(entry["key"]), "rb")
+        except FileNotFoundError:
+            with self._lock:
+                self.entries.pop(entry["key"], None)
+                self._by_url.pop(entry["url"], None)
+            return None
+        with self._lock:
+            self.hits += 1
+            if entry["key"] in self.entries:
+                self.entries[entry["key"]]["last_access"] = time.time()
+            self._touched += 1
+            due = self._touched >= self.sync_every
+        if due:
+            self.save()
+        return f
+
+    def add(self, url: str, headers, source) -> Optional[dict]:
+        """
+        Copy the downloaded archive in the file object `source` into the cache,
+        with the ETag/Last-Modified/Content-Length of its response `headers`.
+        A body shorter than its Content-Length, or larger than the whole cache,
+        is not kept. Leaves `source` at its end.
+        """
+        source.seek(0, os.SEEK_END)
+        size = source.tell()
+        with self._lock:
+            self.misses += 1
+        length = headers.get("Content-Length")
+        if (length is not None and length.isdigit() and int(length) != size) or size > self.max_bytes:
+            return None
+        etag = headers.get("ETag")
+        key = archive_key(url, etag, size)
+        fd, tmp = tempfile.mkstemp(dir=self.data, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                source.seek(0)
+                shutil.copyfileobj(source, f, 1024 * 1024)
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            os.remove(tmp)
+            raise
+        finally:
+            source.seek(0, os.SEEK_END)
+        now = time.time()
+        entry = {"url": url, "etag": etag, "last_modified": headers.get("Last-Modified"), "size": size,
+                 "stored_at": now, "last_access": now}
+        with self._locked():
+            self.entries[key] = entry
+            self._sync(keep=key)
+        return dict(entry, key=key)
+
+    def download(self, url: str, target: str, session=None, chunk_size: int = 1024 * 1024, **kwargs) -> bool:
+        """
+        Fetch `url` into the file `target` through the cache, with `session`
+        (requests or anything with its get(), default requests). Returns True
+        if it came from the cache; HTTP errors raise as raise_for_status().
+        """
+        if session is None:
+            import requests as session
+        entry = self.lookup(url)
+        if entry is not None and not self.revalidate and self._copy(entry, target):
+            return True
+        with session.get(url, stream=True, headers=self.request_headers(entry), **kwargs) as resp:
+            if self.current(entry, resp.status_code, resp.headers) and self._copy(entry, target):
+                return True
+            if resp.status_code == 304:  # evicted between lookup and copy
+                entry = None
+            else:
+                resp.raise_for_status()
+                with open(target, "w+b") as f:
+                    for block in resp.iter_content(chunk_size=chunk_size):
+                        f.write(block)
+                    self.add(url, resp.headers, f)
+                return False
+        return self.download(url, target, session, chunk_size, **kwargs)
+
+    def _copy(self, entry: dict, target: str) -> bool:
+        cached = self.open(entry)
+        if cached is None:
+            return False
+        with cached, open(target, "wb") as f:
+            shutil.copyfileobj(cached, f, 1024 * 1024)
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(self.entries), "bytes": sum(e["size"] for e in self.entries.values())}
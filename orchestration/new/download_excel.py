@@ -1,27 +1,110 @@
+import hashlib
+import json
 import logging
 import os
 import requests
 from urllib.parse import urlparse
 import pandas as pd
-from io import BytesIO, StringIO
-import obstore as obs
+from io import BytesIO
 from obstore.store import from_url
+from http_transport import HttpTransport
+from run_metrics import RunMetrics, ScrapeResult, emit
+from storage import as_backend
 
+# Sheets of the registration workbook converted on every change; duid.sql reads PU and Scheduled Loads
+SHEETS = ("PU and Scheduled Loads", "Ancillary Services", "Registered Participants")
 
 
-def download_excel( folder: str, ws: str, lh:str) :
-    """Download files from URLs and save to object storage using obstore"""
-    store = from_url(f'abfss://{ws}@onelake.dfs.fabric.microsoft.com/{lh}.Lakehouse/Files')
+def excel_engine():
+    """calamine (Rust) when python-calamine is installed, several times faster on .xls than xlrd; else pandas' default."""
+    try:
+        import python_calamine  # noqa: F401
+        return "calamine"
+    except ImportError:
+        return None
+
+
+def typed_table(df: pd.DataFrame):
+    """
+    Arrow table of one sheet: numeric and datetime columns keep the types
+    the reader inferred, object columns Arrow cannot type (text mixed with
+    numbers, as in code columns) become strings.
+    """
+    import pyarrow as pa
+
+    df.columns = [str(column) for column in df.columns]
+    for column in df.columns[df.dtypes == object]:
+        try:
+            pa.array(df[column], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[column] = df[column].astype("string")
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def sheet_bytes(df: pd.DataFrame, output_format: str) -> bytes:
+    if output_format == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        buffer = pa.BufferOutputStream()
+        pq.write_table(typed_table(df), buffer, compression="zstd")
+        return buffer.getvalue().to_pybytes()
+    buffer = BytesIO()
+    df.to_csv(buffer, index=False)
+    return buffer.getvalue()
+
+
+def sheet_path(folder: str, filename: str, sheet: str, output_format: str) -> str:
+    """<folder><workbook stem>_<sheet with underscores>.csv|.parquet, the names duid.sql and duid__parquet.sql read."""
+    return f"{folder}{os.path.splitext(filename)[0].lower()}_{sheet.replace(' ', '_')}.{output_format}"
+
+
+def load_state(store, path: str) -> dict:
+    try:
+        return json.loads(store.get(path))
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logging.warning(f"Ignoring unreadable download state {path}: {e}")
+        return {}
+
+
+def download_excel(folder: str, ws: str, lh: str, store=None, output_format: str = "csv",
+                   sheets=SHEETS, metrics_sink=None):
+    """
+    Download the NEM registration and exemption workbook and land its sheets
+    under `folder` as CSV or, with output_format="parquet", typed ZSTD
+    Parquet (for duid__parquet.sql).
+
+    The workbook is fetched conditionally: the ETag/Last-Modified and the
+    SHA-256 of the last workbook converted are kept in
+    <folder>_state/<workbook>.json, so a 304, or a 200 with the same
+    content, skips the upload and every conversion. Otherwise the workbook
+    is opened once and each sheet of `sheets` it has is converted and put
+    to `store` (an obstore store or a storage.StorageBackend). Per-sheet
+    conversion and upload times are logged and handed to `metrics_sink` as
+    a RunMetrics (convert/upload spans with the sheet as file).
+
+    Returns:
+        ScrapeResult: 1 (also when unchanged) with the RunMetrics on
+        `.metrics`, or "" if the AEMO session could not be established
+    """
+    if store is None:
+        store = from_url(f'abfss://{ws}@onelake.dfs.fabric.microsoft.com/{lh}.Lakehouse/Files')
+    store = as_backend(store)
+    if output_format not in ("csv", "parquet"):
+        raise ValueError(f"Unknown output_format '{output_format}', use 'csv' or 'parquet'")
     if not folder.endswith("/"):
         folder += "/"
 
     saved_paths = []
+    metrics = RunMetrics("excel")
 
     # The page where the download link is found. We visit this first.
     landing_page_url = "https://aemo.com.au/en/energy-systems/electricity/national-electricity-market-nem/participant-information/nem-registration-and-exemption-list"
 
-    # Use a session object to persist headers and cookies across requests
-    with requests.Session() as session:
+    # One pooled, retrying client persists headers and cookies across requests
+    with HttpTransport(pool_size=2, connect_timeout=15, read_timeout=30) as session:
         # Set the headers for the entire session
         session.headers.update({
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.9',
@@ -34,7 +117,7 @@ def download_excel( folder: str, ws: str, lh:str) :
         try:
             # STEP 1: Visit the landing page to establish the session and get cookies.
             logging.info(f"Visiting landing page to establish session: {landing_page_url}")
-            session.get(landing_page_url, timeout=15)
+            session.get(landing_page_url)
             logging.info("Session established successfully.")
         except requests.exceptions.RequestException as e:
             logging.error(f"Could not visit the landing page to establish a session: {e}")
@@ -45,35 +128,81 @@ def download_excel( folder: str, ws: str, lh:str) :
             if not filename:
                 continue
 
+            # Validators only count for the same outputs: a new format or sheet list converts again
+            state_path = f"{folder}_state/{filename}.json"
+            state = load_state(store, state_path)
+            if state.get("output_format") != output_format or state.get("sheets") != list(sheets):
+                state = {}
+            conditional = {}
+            if state.get("etag"):
+                conditional["If-None-Match"] = state["etag"]
+            if state.get("last_modified"):
+                conditional["If-Modified-Since"] = state["last_modified"]
+
             try:
                 # STEP 2: Download the file using the established session.
                 # The session will automatically send the necessary cookies.
                 logging.info(f"Attempting to download file: {url}")
-                response = session.get(url, timeout=30)
-                response.raise_for_status()
+                with metrics.span(url, "download", filename) as span:
+                    response = session.get(url, headers=conditional)
+                    span["retries"] = response.retries
+                    if response.status_code != 304:
+                        response.raise_for_status()
+                        span["bytes_in"] = len(response.content)
+                if response.status_code == 304:
+                    logging.info(f"{filename} not modified since {state.get('last_modified') or state['etag']}")
+                    continue
+
+                digest = hashlib.sha256(response.content).hexdigest()
+                validators = {"etag": response.headers.get("ETag"),
+                              "last_modified": response.headers.get("Last-Modified")}
+                if digest == state.get("sha256"):
+                    # Same workbook under new validators: remember them, convert nothing
+                    logging.info(f"{filename} content unchanged (sha256 {digest[:12]})")
+                    store.put(state_path, json.dumps({**state, **validators}).encode("utf-8"))
+                    continue
 
-                # --- The rest of your code is the same ---
                 target_path = folder + filename
-                store.put(target_path, response.content)
+                with metrics.span(url, "upload", filename) as span:
+                    store.put(target_path, response.content)
+                    span["bytes_out"] = len(response.content)
                 saved_paths.append(target_path)
                 logging.info(f"Successfully downloaded and saved {target_path}")
 
-                if filename.lower() == "nem-registration-and-exemption-list.xls":
-                    try:
-                        df = pd.read_excel(BytesIO(response.content), sheet_name="PU and Scheduled Loads")
-                        csv_buffer = StringIO()
-                        df.to_csv(csv_buffer, index=False)
-                        csv_filename = "nem-registration-and-exemption-list_PU_and_Scheduled_Loads.csv"
-                        csv_path = folder + csv_filename
-                        store.put(csv_path, csv_buffer.getvalue().encode('utf-8'))
-                        saved_paths.append(csv_path)
-                        logging.info(f"Successfully converted and saved {csv_path}")
-                    except Exception as e:
-                        logging.error(f"Failed to convert sheet from {filename}: {e}")
+                try:
+                    # One parse of the workbook for every sheet
+                    with pd.ExcelFile(BytesIO(response.content), engine=excel_engine()) as workbook:
+                        for sheet in sheets:
+                            if sheet not in workbook.sheet_names:
+                                logging.warning(f"{filename} has no sheet '{sheet}'")
+                                continue
+                            path = sheet_path(folder, filename, sheet, output_format)
+                            with metrics.span(url, "convert", sheet) as span:
+                                data = sheet_bytes(workbook.parse(sheet), output_format)
+                                span["bytes_out"] = len(data)
+                            with metrics.span(url, "upload", sheet) as span:
+                                store.put(path, data)
+                                span["bytes_out"] = len(data)
+                            saved_paths.append(path)
+                            logging.info(f"Successfully converted and saved {path}")
+                    store.put(state_path, json.dumps({**validators, "sha256": digest,
+                                                      "output_format": output_format,
+                                                      "sheets": list(sheets)}).encode("utf-8"))
+                except Exception as e:
+                    logging.error(f"Failed to convert sheets from {filename}: {e}")
 
             except requests.exceptions.HTTPError as http_err:
                 logging.error(f"HTTP error for {url}: {http_err} - Status: {http_err.response.status_code}")
             except Exception as e:
                 logging.error(f"An unexpected error occurred for {url}: {e}")
 
-    return 1
+        metrics.finish(len(saved_paths), session.stats())
+
+    for span in metrics.spans:
+        if span["phase"] == "convert":
+            logging.info(f"Converted '{span['file']}' in {span['seconds']:.2f}s ({span['bytes_out'] / 1e6:.2f} MB)")
+    logging.info(f"HTTP: {metrics.http}")
+    logging.info(metrics.summary_line())
+    emit(metrics, metrics_sink)
+
+    return ScrapeResult(1, metrics)
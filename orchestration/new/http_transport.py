@@ -0,0 +1,257 @@
+import random
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+    import h2  # noqa: F401  httpx only negotiates HTTP/2 when h2 is installed
+except ImportError:
+    httpx = None
+
+# Transient failures worth another attempt
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_ERRORS = (requests.ConnectionError, requests.Timeout)
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Exponential backoff with full jitter: uniform(0, min(cap, base * 2**attempt))."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class TransportStats:
+    """Thread-safe counters reported by HttpTransport.stats()."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.new_connections = 0
+
+    def add(self, **counts) -> None:
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+
+class _HttpxResponse:
+    """The subset of requests.Response the downloaders use, over an httpx response."""
+
+    def __init__(self, response):
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = str(response.url)
+
+    @property
+    def ok(self) -> bool:
+        return self._response.is_success
+
+    @property
+    def content(self) -> bytes:
+        return self._response.read()
+
+    @property
+    def text(self) -> str:
+        self._response.read()
+        return self._response.text
+
+    def json(self):
+        self._response.read()
+        return self._response.json()
+
+    def iter_content(self, chunk_size: int = 1024 * 1024):
+        return self._response.iter_bytes(chunk_size)
+
+    def raise_for_status(self) -> None:
+        if not self.ok:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+    def close(self) -> None:
+        self._response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _Response:
+    """Wraps a response so closing it also frees its per-host slot."""
+
+    def __init__(self, response, release):
+        self._response = response
+        self._release = release
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def close(self) -> None:
+        if self._release is not None:
+            self._response.close()
+            self._release()
+            self._release = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class HttpTransport:
+    """
+    Shared HTTP client for the nemweb, GitHub and AEMO downloaders.
+
+    One keep-alive connection pool per host, sized to `pool_size` (the worker
+    count), HTTP/2 when httpx and h2 are installed and `http2` is set, retries
+    with exponential backoff and jitter on connection errors and 429/5xx, a
+    cap of `per_host_limit` in-flight requests per host, and a wall-clock
+    `budget` per request covering every attempt. stats() reports requests,
+    retries, failures and how many requests reused a pooled connection.
+
+    Usage:
+        http = HttpTransport(pool_size=8)
+        with http.get(url, stream=True) as resp:
+            for block in resp.iter_content(chunk_size): ...
+    """
+
+    def __init__(self, pool_size: int = 8, per_host_limit: Optional[int] = None, max_retries: int = 4,
+                 connect_timeout: float = 10.0, read_timeout: float = 30.0, budget: float = 120.0,
+                 headers: Optional[Dict[str, str]] = None, http2: bool = True):
+        self.pool_size = pool_size
+        self.per_host_limit = per_host_limit or pool_size
+        self.max_retries = max_retries
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.budget = budget
+        self._stats = TransportStats()
+        self._host_limits = {}
+        self._host_lock = threading.Lock()
+
+        self.http2 = bool(http2 and httpx is not None)
+        if self.http2:
+            limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+            self._client = httpx.Client(http2=True, limits=limits, headers=headers, follow_redirects=True)
+        else:
+            self._client = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True)
+            self._client.mount("http://", adapter)
+            self._client.mount("https://", adapter)
+            if headers:
+                self._client.headers.update(headers)
+
+    @property
+    def headers(self):
+        return self._client.headers
+
+    def _host_limit(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).netloc
+        with self._host_lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._host_limits[host]
+
+    def _trace(self, event_name: str, info: dict) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            self._stats.add(new_connections=1)
+
+    def _send(self, method: str, url: str, timeout: float, **kwargs):
+        if self.http2:
+            request = self._client.build_request(method, url, timeout=httpx.Timeout(timeout, connect=self.connect_timeout),
+                                                 extensions={"trace": self._trace}, **kwargs)
+            # Surface httpx failures as requests exceptions so callers handle one family
+            try:
+                return _HttpxResponse(self._client.send(request, stream=True))
+            except httpx.TimeoutException as e:
+                raise requests.Timeout(str(e)) from e
+            except httpx.TransportError as e:
+                raise requests.ConnectionError(str(e)) from e
+        response = self._client.request(method, url, stream=True, timeout=(self.connect_timeout, timeout), **kwargs)
+        # Tag urllib3 connections on first use; an untagged one was just opened
+        conn = getattr(response.raw, "connection", None)
+        if not getattr(conn, "_transport_used", False):
+            self._stats.add(new_connections=1)
+            if conn is not None:
+                conn._transport_used = True
+        return response
+
+    @staticmethod
+    def _complete(response, limit, stream: bool):
+        if stream:
+            return _Response(response, limit.release)
+        try:
+            response.content  # read the body so the connection goes back to the pool
+        finally:
+            response.close()
+            limit.release()
+        return response
+
+    def request(self, method: str, url: str, stream: bool = False, **kwargs):
+        """
+        Send a request with retries; the last response is returned even if it
+        is a 4xx/5xx, with the number of retries it took on `.retries`.
+        """
+        deadline = time.monotonic() + self.budget
+        limit = self._host_limit(url)
+        attempt = 0
+        while True:
+            timeout = max(1.0, min(self.read_timeout, deadline - time.monotonic()))
+            limit.acquire()
+            self._stats.add(requests=1)
+            try:
+                response = self._send(method, url, timeout, **kwargs)
+            except RETRY_ERRORS:
+                limit.release()
+                delay = backoff_delay(attempt)
+                if attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+                    self._stats.add(failures=1)
+                    raise
+            except Exception:
+                limit.release()
+                self._stats.add(failures=1)
+                raise
+            else:
+                response.retries = attempt
+                if response.status_code not in RETRY_STATUSES:
+                    return self._complete(response, limit, stream)
+                delay = backoff_delay(attempt)
+                retry_after = response.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+                if attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+                    self._stats.add(failures=1)
+                    return self._complete(response, limit, stream)
+                self._complete(response, limit, stream=False)
+            attempt += 1
+            self._stats.add(retries=1)
+            time.sleep(delay)
+
+    def get(self, url: str, stream: bool = False, **kwargs):
+        return self.request("GET", url, stream=stream, **kwargs)
+
+    def stats(self) -> dict:
+        s = self._stats
+        return {
+            "client": "httpx (HTTP/2 where negotiated)" if self.http2 else "requests (HTTP/1.1)",
+            "requests": s.requests,
+            "retries": s.retries,
+            "failures": s.failures,
+            "new_connections": s.new_connections,
+            "reused_connections": max(0, s.requests - s.new_connections),
+        }
+
+    def close(self) -> None:
+        self._client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
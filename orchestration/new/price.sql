@@ -2,9 +2,9 @@ CREATE VIEW if not exists price(file) AS SELECT 'dummy';
 SET VARIABLE list_of_files_price =
 (
   WITH xxxx AS (
-    SELECT
+    SELECT DISTINCT
       concat('abfss://$ws@onelake.dfs.fabric.microsoft.com/$lh.Lakehouse/Files/', extracted_filepath) AS file
-    FROM 'abfss://$ws@onelake.dfs.fabric.microsoft.com/$lh.Lakehouse/Files/Reports/Current/Daily_Reports/download_log.csv'
+    FROM read_csv('abfss://$ws@onelake.dfs.fabric.microsoft.com/$lh.Lakehouse/Files/Reports/Current/Daily_Reports/download_log/*/*.csv', union_by_name = true)
     WHERE parse_filename(extracted_filepath) NOT IN (SELECT DISTINCT file FROM price)
     ORDER BY file
     -- LIMIT 1000
@@ -2,9 +2,9 @@ CREATE VIEW if not exists price_today(file) AS SELECT 'dummy';
 SET VARIABLE list_of_files_price_today =
 (
   WITH xxxx AS (
-    SELECT
+    SELECT DISTINCT
       concat('abfss://$ws@onelake.dfs.fabric.microsoft.com/$lh.Lakehouse/Files/', extracted_filepath) AS file
-    FROM 'abfss://$ws@onelake.dfs.fabric.microsoft.com/$lh.Lakehouse/Files/Reports/Current/DispatchIS_Reports/download_log.csv'
+    FROM read_csv('abfss://$ws@onelake.dfs.fabric.microsoft.com/$lh.Lakehouse/Files/Reports/Current/DispatchIS_Reports/download_log/*/*.csv', union_by_name = true)
     WHERE parse_filename(extracted_filepath) NOT IN (SELECT DISTINCT file FROM price_today)
     ORDER BY file
     LIMIT 5000
@@ -0,0 +1,85 @@
+CREATE VIEW if not exists price_today(file) AS SELECT 'dummy';
+SET VARIABLE list_of_files_price_today =
+(
+  WITH xxxx AS (
+    SELECT DISTINCT
+      concat('abfss://$ws@onelake.dfs.fabric.microsoft.com/$lh.Lakehouse/Files/', extracted_filepath) AS file
+    FROM read_csv('abfss://$ws@onelake.dfs.fabric.microsoft.com/$lh.Lakehouse/Files/Reports/Current/DispatchIS_Reports/download_log/*/*.csv', union_by_name = true)
+    WHERE extracted_filepath LIKE '%/parquet/record=DISPATCH_PRICE/%'
+      AND parse_filename(extracted_filepath) NOT IN (SELECT DISTINCT file FROM price_today)
+    ORDER BY file
+    LIMIT 5000
+  )
+  SELECT list(file) FROM xxxx
+);
+-- Typed ZSTD Parquet landed by scraping(output_format='parquet'), one AEMO record type per file:
+-- no CSV parsing, and only the columns and row groups below are read
+SELECT
+    REGIONID,
+    CAST(RUNNO AS DOUBLE) AS RUNNO,
+    CAST(DISPATCHINTERVAL AS DOUBLE) AS DISPATCHINTERVAL,
+    CAST(INTERVENTION AS DOUBLE) AS INTERVENTION,
+    CAST(RRP AS DOUBLE) AS RRP,
+    CAST(EEP AS DOUBLE) AS EEP,
+    CAST(ROP AS DOUBLE) AS ROP,
+    CAST(APCFLAG AS DOUBLE) AS APCFLAG,
+    CAST(MARKETSUSPENDEDFLAG AS DOUBLE) AS MARKETSUSPENDEDFLAG,
+    CAST(RAISE6SECRRP AS DOUBLE) AS RAISE6SECRRP,
+    CAST(RAISE6SECROP AS DOUBLE) AS RAISE6SECROP,
+    CAST(RAISE6SECAPCFLAG AS DOUBLE) AS RAISE6SECAPCFLAG,
+    CAST(RAISE60SECRRP AS DOUBLE) AS RAISE60SECRRP,
+    CAST(RAISE60SECROP AS DOUBLE) AS RAISE60SECROP,
+    CAST(RAISE60SECAPCFLAG AS DOUBLE) AS RAISE60SECAPCFLAG,
+    CAST(RAISE5MINRRP AS DOUBLE) AS RAISE5MINRRP,
+    CAST(RAISE5MINROP AS DOUBLE) AS RAISE5MINROP,
+    CAST(RAISE5MINAPCFLAG AS DOUBLE) AS RAISE5MINAPCFLAG,
+    CAST(RAISEREGRRP AS DOUBLE) AS RAISEREGRRP,
+    CAST(RAISEREGROP AS DOUBLE) AS RAISEREGROP,
+    CAST(RAISEREGAPCFLAG AS DOUBLE) AS RAISEREGAPCFLAG,
+    CAST(LOWER6SECRRP AS DOUBLE) AS LOWER6SECRRP,
+    CAST(LOWER6SECROP AS DOUBLE) AS LOWER6SECROP,
+    CAST(LOWER6SECAPCFLAG AS DOUBLE) AS LOWER6SECAPCFLAG,
+    CAST(LOWER60SECRRP AS DOUBLE) AS LOWER60SECRRP,
+    CAST(LOWER60SECROP AS DOUBLE) AS LOWER60SECROP,
+    CAST(LOWER60SECAPCFLAG AS DOUBLE) AS LOWER60SECAPCFLAG,
+    CAST(LOWER5MINRRP AS DOUBLE) AS LOWER5MINRRP,
+    CAST(LOWER5MINROP AS DOUBLE) AS LOWER5MINROP,
+    CAST(LOWER5MINAPCFLAG AS DOUBLE) AS LOWER5MINAPCFLAG,
+    CAST(LOWERREGRRP AS DOUBLE) AS LOWERREGRRP,
+    CAST(LOWERREGROP AS DOUBLE) AS LOWERREGROP,
+    CAST(LOWERREGAPCFLAG AS DOUBLE) AS LOWERREGAPCFLAG,
+    CAST(PRE_AP_ENERGY_PRICE AS DOUBLE) AS PRE_AP_ENERGY_PRICE,
+    CAST(PRE_AP_RAISE6_PRICE AS DOUBLE) AS PRE_AP_RAISE6_PRICE,
+    CAST(PRE_AP_RAISE60_PRICE AS DOUBLE) AS PRE_AP_RAISE60_PRICE,
+    CAST(PRE_AP_RAISE5MIN_PRICE AS DOUBLE) AS PRE_AP_RAISE5MIN_PRICE,
+    CAST(PRE_AP_RAISEREG_PRICE AS DOUBLE) AS PRE_AP_RAISEREG_PRICE,
+    CAST(PRE_AP_LOWER6_PRICE AS DOUBLE) AS PRE_AP_LOWER6_PRICE,
+    CAST(PRE_AP_LOWER60_PRICE AS DOUBLE) AS PRE_AP_LOWER60_PRICE,
+    CAST(PRE_AP_LOWER5MIN_PRICE AS DOUBLE) AS PRE_AP_LOWER5MIN_PRICE,
+    CAST(PRE_AP_LOWERREG_PRICE AS DOUBLE) AS PRE_AP_LOWERREG_PRICE,
+    CAST(RAISE1SECRRP AS DOUBLE) AS RAISE1SECRRP,
+    CAST(RAISE1SECROP AS DOUBLE) AS RAISE1SECROP,
+    CAST(RAISE1SECAPCFLAG AS DOUBLE) AS RAISE1SECAPCFLAG,
+    CAST(LOWER1SECRRP AS DOUBLE) AS LOWER1SECRRP,
+    CAST(LOWER1SECROP AS DOUBLE) AS LOWER1SECROP,
+    CAST(LOWER1SECAPCFLAG AS DOUBLE) AS LOWER1SECAPCFLAG,
+    CAST(PRE_AP_RAISE1_PRICE AS DOUBLE) AS PRE_AP_RAISE1_PRICE,
+    CAST(PRE_AP_LOWER1_PRICE AS DOUBLE) AS PRE_AP_LOWER1_PRICE,
+    CAST(CUMUL_PRE_AP_ENERGY_PRICE AS DOUBLE) AS CUMUL_PRE_AP_ENERGY_PRICE,
+    CAST(CUMUL_PRE_AP_RAISE6_PRICE AS DOUBLE) AS CUMUL_PRE_AP_RAISE6_PRICE,
+    CAST(CUMUL_PRE_AP_RAISE60_PRICE AS DOUBLE) AS CUMUL_PRE_AP_RAISE60_PRICE,
+    CAST(CUMUL_PRE_AP_RAISE5MIN_PRICE AS DOUBLE) AS CUMUL_PRE_AP_RAISE5MIN_PRICE,
+    CAST(CUMUL_PRE_AP_RAISEREG_PRICE AS DOUBLE) AS CUMUL_PRE_AP_RAISEREG_PRICE,
+    CAST(CUMUL_PRE_AP_LOWER6_PRICE AS DOUBLE) AS CUMUL_PRE_AP_LOWER6_PRICE,
+    CAST(CUMUL_PRE_AP_LOWER60_PRICE AS DOUBLE) AS CUMUL_PRE_AP_LOWER60_PRICE,
+    CAST(CUMUL_PRE_AP_LOWER5MIN_PRICE AS DOUBLE) AS CUMUL_PRE_AP_LOWER5MIN_PRICE,
+    CAST(CUMUL_PRE_AP_LOWERREG_PRICE AS DOUBLE) AS CUMUL_PRE_AP_LOWERREG_PRICE,
+    CAST(CUMUL_PRE_AP_RAISE1_PRICE AS DOUBLE) AS CUMUL_PRE_AP_RAISE1_PRICE,
+    CAST(CUMUL_PRE_AP_LOWER1_PRICE AS DOUBLE) AS CUMUL_PRE_AP_LOWER1_PRICE,
+    CAST(week AS DOUBLE) AS week, -- hive partition column, as the CSV model picks it up
+    CAST(SETTLEMENTDATE AS TIMESTAMPTZ) AS SETTLEMENTDATE,
+    CAST(SETTLEMENTDATE AS date) AS date,
+    parse_filename(filename) AS file,
+    year(CAST(SETTLEMENTDATE AS TIMESTAMPTZ)) AS YEAR
+FROM read_parquet(getvariable('list_of_files_price_today'), filename = true, union_by_name = true)
+ORDER BY date
@@ -0,0 +1,189 @@
+import datetime
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# Phases in pipeline order, for the printed summary; spans may use any name
+PHASES = ("list", "manifest_read", "download_queue", "download", "archive_cache", "recompress_queue",
+          "recompress", "upload_queue", "upload", "recompress_upload", "manifest_write")
+
+COLUMNS = ("run_id", "engine", "run_started_at", "url", "file", "phase", "started_at", "seconds",
+           "bytes_in", "bytes_out", "retries", "concurrency", "ok")
+
+
+class RunMetrics:
+    """
+    Per-URL and per-file spans of one ingestion run.
+
+    A span is one phase of one URL (file=None: listing, manifest reads and
+    writes) or of one file (download, queue waits, recompress, upload), with
+    its wall time, bytes in/out, HTTP retries, the stage's concurrency
+    limit when it started (downloads and uploads) and whether it succeeded.
+    Thread-safe; the spans are plain dicts so they can go straight to Arrow.
+
+    Usage:
+        metrics = RunMetrics("threaded")
+        with metrics.span(url, "download", filename) as span:
+            ...
+            span["bytes_in"] = size
+    """
+
+    def __init__(self, engine: str):
+        self.run_id = uuid.uuid4().hex
+        self.engine = engine
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+        self.finished_at = None
+        self.files = 0
+        self.http = {}
+        self.limits = {}
+        self.spans: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def record(self, url: str, phase: str, seconds: float, file: Optional[str] = None, bytes_in: int = 0,
+               bytes_out: int = 0, retries: int = 0, ok: bool = True, started_at: datetime.datetime = None,
+               concurrency: Optional[int] = None) -> None:
+        if started_at is None:
+            started_at = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=seconds)
+        span = {"url": url, "file": file, "phase": phase, "started_at": started_at, "seconds": seconds,
+                "bytes_in": bytes_in, "bytes_out": bytes_out, "retries": retries, "concurrency": concurrency,
+                "ok": ok}
+        with self._lock:
+            self.spans.append(span)
+
+    @contextmanager
+    def span(self, url: str, phase: str, file: Optional[str] = None):
+        """
+        Time the block as one span. Set bytes_in/bytes_out/retries/concurrency
+        on the yielded dict, and ok=False for a failure handled without raising.
+        """
+        counts = {"bytes_in": 0, "bytes_out": 0, "retries": 0, "concurrency": None, "ok": True}
+        started_at = datetime.datetime.now(datetime.timezone.utc)
+        start = time.perf_counter()
+        try:
+            yield counts
+        except BaseException:
+            counts["ok"] = False
+            raise
+        finally:
+            self.record(url, phase, time.perf_counter() - start, file, started_at=started_at, **counts)
+
+    def finish(self, files: int, http: Optional[dict] = None, limits: Optional[dict] = None) -> "RunMetrics":
+        """`limits`: AdaptiveLimiter.stats() per stage."""
+        self.files = files
+        self.http = http or {}
+        self.limits = limits or {}
+        self.finished_at = datetime.datetime.now(datetime.timezone.utc)
+        return self
+
+    def phase_totals(self, url: Optional[str] = None) -> Dict[str, Dict]:
+        """{phase: {spans, seconds, bytes_in, bytes_out, retries, errors}}, for one URL or the whole run."""
+        totals = {}
+        with self._lock:
+            spans = [s for s in self.spans if url is None or s["url"] == url]
+        for s in spans:
+            t = totals.setdefault(s["phase"], {"spans": 0, "seconds": 0.0, "bytes_in": 0, "bytes_out": 0,
+                                               "retries": 0, "errors": 0})
+            t["spans"] += 1
+            t["seconds"] += s["seconds"]
+            t["bytes_in"] += s["bytes_in"]
+            t["bytes_out"] += s["bytes_out"]
+            t["retries"] += s["retries"]
+            t["errors"] += not s["ok"]
+        return totals
+
+    def summary_line(self) -> str:
+        """One line per run: summed seconds and MB per phase (summed over threads, so not wall time)."""
+        totals = self.phase_totals()
+        order = [p for p in PHASES if p in totals] + sorted(p for p in totals if p not in PHASES)
+        parts = []
+        for phase in order:
+            t = totals[phase]
+            part = f"{phase} {t['seconds']:.2f}s"
+            moved = max(t["bytes_in"], t["bytes_out"])
+            if moved:
+                part += f" {moved / 1e6:.1f}MB"
+            if t["retries"]:
+                part += f" {t['retries']} retries"
+            if t["errors"]:
+                part += f" {t['errors']} errors"
+            parts.append(part)
+        for stage, limit in self.limits.items():
+            parts.append(f"{stage} limit {limit['initial']}->{limit['limit']} (peak {limit['peak']}, "
+                         f"bounds {limit['floor']}-{limit['ceiling']})")
+        wall = ((self.finished_at or datetime.datetime.now(datetime.timezone.utc)) - self.started_at).total_seconds()
+        return f"Phases ({wall:.2f}s wall): " + ", ".join(parts)
+
+    def rows(self) -> List[Dict]:
+        run = {"run_id": self.run_id, "engine": self.engine, "run_started_at": self.started_at}
+        with self._lock:
+            return [{**run, **span} for span in self.spans]
+
+    def to_arrow(self):
+        """The spans as a pyarrow Table with a fixed schema, one row per span."""
+        import pyarrow as pa
+
+        ts = pa.timestamp("us", tz="UTC")
+        schema = pa.schema([("run_id", pa.string()), ("engine", pa.string()), ("run_started_at", ts),
+                            ("url", pa.string()), ("file", pa.string()), ("phase", pa.string()),
+                            ("started_at", ts), ("seconds", pa.float64()), ("bytes_in", pa.int64()),
+                            ("bytes_out", pa.int64()), ("retries", pa.int32()), ("concurrency", pa.int32()),
+                            ("ok", pa.bool_())])
+        rows = self.rows()
+        return pa.table({name: [row[name] for row in rows] for name in COLUMNS}, schema=schema)
+
+
+class ScrapeResult(int):
+    """
+    scraping()'s return value: still 1 (files ingested) or 0, so callers such
+    as Tasksql._run_py_task keep comparing it to 1, with the run's
+    RunMetrics on `.metrics`.
+    """
+
+    def __new__(cls, value: int, metrics: RunMetrics):
+        result = super().__new__(cls, value)
+        result.metrics = metrics
+        return result
+
+    def __reduce__(self):
+        # RunMetrics holds a lock; across processes (e.g. a multiprocessing queue) the plain int goes
+        return int, (int(self),)
+
+
+def parquet_sink(store, prefix: str = "_metrics/scraping/"):
+    """
+    Sink writing each run's spans as one Parquet object,
+    <prefix>date=YYYY-MM-DD/<run_id>.parquet, to `store` (an obstore store
+    or a storage.StorageBackend).
+    Read back with read_parquet('<prefix>*/*.parquet', hive_partitioning = true).
+    """
+    def sink(metrics: RunMetrics) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        from storage import as_backend
+
+        buffer = pa.BufferOutputStream()
+        pq.write_table(metrics.to_arrow(), buffer, compression="zstd")
+        path = f"{prefix.rstrip('/')}/date={metrics.started_at:%Y-%m-%d}/{metrics.run_id}.parquet"
+        as_backend(store).put(path, buffer.getvalue().to_pybytes())
+    return sink
+
+
+def delta_sink(table_uri: str, storage_options: Optional[Dict[str, str]] = None):
+    """Sink appending each run's spans to the Delta table at `table_uri` (created on first use)."""
+    def sink(metrics: RunMetrics) -> None:
+        from deltalake import write_deltalake
+
+        write_deltalake(table_uri, metrics.to_arrow(), mode="append", storage_options=storage_options)
+    return sink
+
+
+def emit(metrics: RunMetrics, sink) -> None:
+    """Hand the finished run to `sink`; a failing sink is reported, never fails the run."""
+    if sink is None:
+        return
+    try:
+        sink(metrics)
+    except Exception as e:
+        print(f"Could not write run metrics {metrics.run_id}: {e}")
@@ -0,0 +1,74 @@
+CREATE VIEW if not exists scada(file) AS SELECT 'dummy';
+SET VARIABLE list_of_files_scada =
+(
+  WITH xxxx AS (
+    SELECT DISTINCT
+      concat('abfss://$ws@onelake.dfs.fabric.microsoft.com/$lh.Lakehouse/Files/', extracted_filepath) AS file
+    FROM read_csv('abfss://$ws@onelake.dfs.fabric.microsoft.com/$lh.Lakehouse/Files/Reports/Current/Daily_Reports/download_log/*/*.csv', union_by_name = true)
+    WHERE extracted_filepath LIKE '%/parquet/record=DUNIT/%'
+      AND parse_filename(extracted_filepath) NOT IN (SELECT DISTINCT file FROM scada)
+    ORDER BY file
+    -- LIMIT 1000
+  )
+  SELECT list(file) FROM xxxx
+);
+-- Typed ZSTD Parquet landed by scraping(output_format='parquet'), one AEMO record type per file:
+-- no CSV parsing, and only the columns and row groups below are read
+SELECT
+    REPORT AS UNIT,
+    DUID,
+    CAST(VERSION AS DOUBLE) AS VERSION,
+    CAST(RUNNO AS DOUBLE) AS RUNNO,
+    CAST(INTERVENTION AS DOUBLE) AS INTERVENTION,
+    CAST(DISPATCHMODE AS DOUBLE) AS DISPATCHMODE,
+    CAST(AGCSTATUS AS DOUBLE) AS AGCSTATUS,
+    CAST(INITIALMW AS DOUBLE) AS INITIALMW,
+    CAST(TOTALCLEARED AS DOUBLE) AS TOTALCLEARED,
+    CAST(RAMPDOWNRATE AS DOUBLE) AS RAMPDOWNRATE,
+    CAST(RAMPUPRATE AS DOUBLE) AS RAMPUPRATE,
+    CAST(LOWER5MIN AS DOUBLE) AS LOWER5MIN,
+    CAST(LOWER60SEC AS DOUBLE) AS LOWER60SEC,
+    CAST(LOWER6SEC AS DOUBLE) AS LOWER6SEC,
+    CAST(RAISE5MIN AS DOUBLE) AS RAISE5MIN,
+    CAST(RAISE60SEC AS DOUBLE) AS RAISE60SEC,
+    CAST(RAISE6SEC AS DOUBLE) AS RAISE6SEC,
+    CAST(MARGINAL5MINVALUE AS DOUBLE) AS MARGINAL5MINVALUE,
+    CAST(MARGINAL60SECVALUE AS DOUBLE) AS MARGINAL60SECVALUE,
+    CAST(MARGINAL6SECVALUE AS DOUBLE) AS MARGINAL6SECVALUE,
+    CAST(MARGINALVALUE AS DOUBLE) AS MARGINALVALUE,
+    CAST(VIOLATION5MINDEGREE AS DOUBLE) AS VIOLATION5MINDEGREE,
+    CAST(VIOLATION60SECDEGREE AS DOUBLE) AS VIOLATION60SECDEGREE,
+    CAST(VIOLATION6SECDEGREE AS DOUBLE) AS VIOLATION6SECDEGREE,
+    CAST(VIOLATIONDEGREE AS DOUBLE) AS VIOLATIONDEGREE,
+    CAST(LOWERREG AS DOUBLE) AS LOWERREG,
+    CAST(RAISEREG AS DOUBLE) AS RAISEREG,
+    CAST(AVAILABILITY AS DOUBLE) AS AVAILABILITY,
+    CAST(RAISE6SECFLAGS AS DOUBLE) AS RAISE6SECFLAGS,
+    CAST(RAISE60SECFLAGS AS DOUBLE) AS RAISE60SECFLAGS,
+    CAST(RAISE5MINFLAGS AS DOUBLE) AS RAISE5MINFLAGS,
+    CAST(RAISEREGFLAGS AS DOUBLE) AS RAISEREGFLAGS,
+    CAST(LOWER6SECFLAGS AS DOUBLE) AS LOWER6SECFLAGS,
+    CAST(LOWER60SECFLAGS AS DOUBLE) AS LOWER60SECFLAGS,
+    CAST(LOWER5MINFLAGS AS DOUBLE) AS LOWER5MINFLAGS,
+    CAST(LOWERREGFLAGS AS DOUBLE) AS LOWERREGFLAGS,
+    CAST(RAISEREGAVAILABILITY AS DOUBLE) AS RAISEREGAVAILABILITY,
+    CAST(RAISEREGENABLEMENTMAX AS DOUBLE) AS RAISEREGENABLEMENTMAX,
+    CAST(RAISEREGENABLEMENTMIN AS DOUBLE) AS RAISEREGENABLEMENTMIN,
+    CAST(LOWERREGAVAILABILITY AS DOUBLE) AS LOWERREGAVAILABILITY,
+    CAST(LOWERREGENABLEMENTMAX AS DOUBLE) AS LOWERREGENABLEMENTMAX,
+    CAST(LOWERREGENABLEMENTMIN AS DOUBLE) AS LOWERREGENABLEMENTMIN,
+    CAST(RAISE6SECACTUALAVAILABILITY AS DOUBLE) AS RAISE6SECACTUALAVAILABILITY,
+    CAST(RAISE60SECACTUALAVAILABILITY AS DOUBLE) AS RAISE60SECACTUALAVAILABILITY,
+    CAST(RAISE5MINACTUALAVAILABILITY AS DOUBLE) AS RAISE5MINACTUALAVAILABILITY,
+    CAST(RAISEREGACTUALAVAILABILITY AS DOUBLE) AS RAISEREGACTUALAVAILABILITY,
+    CAST(LOWER6SECACTUALAVAILABILITY AS DOUBLE) AS LOWER6SECACTUALAVAILABILITY,
+    CAST(LOWER60SECACTUALAVAILABILITY AS DOUBLE) AS LOWER60SECACTUALAVAILABILITY,
+    CAST(LOWER5MINACTUALAVAILABILITY AS DOUBLE) AS LOWER5MINACTUALAVAILABILITY,
+    CAST(LOWERREGACTUALAVAILABILITY AS DOUBLE) AS LOWERREGACTUALAVAILABILITY,
+    CAST(week AS DOUBLE) AS week, -- hive partition column, as the CSV model picks it up
+    parse_filename(filename) AS file,
+    CAST(SETTLEMENTDATE AS TIMESTAMPTZ) AS SETTLEMENTDATE,
+    CAST(SETTLEMENTDATE AS DATE) AS date,
+    YEAR(CAST(SETTLEMENTDATE AS TIMESTAMP)) AS YEAR
+FROM read_parquet(getvariable('list_of_files_scada'), filename = true, union_by_name = true)
+WHERE VERSION = 3
@@ -2,9 +2,9 @@ CREATE VIEW if not exists scada_today(file) AS SELECT 'dummy';
 SET VARIABLE list_of_files_scada_today =
 (
   WITH xxxx AS (
-    SELECT
+    SELECT DISTINCT
       concat('abfss://$ws@onelake.dfs.fabric.microsoft.com/$lh.Lakehouse/Files/', extracted_filepath) AS file
-    FROM 'abfss://$ws@onelake.dfs.fabric.microsoft.com/$lh.Lakehouse/Files/Reports/Current/Dispatch_SCADA/download_log.csv'
+    FROM read_csv('abfss://$ws@onelake.dfs.fabric.microsoft.com/$lh.Lakehouse/Files/Reports/Current/Dispatch_SCADA/download_log/*/*.csv', union_by_name = true)
     WHERE parse_filename(extracted_filepath) NOT IN (SELECT DISTINCT file FROM scada_today)
     ORDER BY file
     LIMIT 500
@@ -0,0 +1,28 @@
+CREATE VIEW if not exists scada_today(file) AS SELECT 'dummy';
+SET VARIABLE list_of_files_scada_today =
+(
+  WITH xxxx AS (
+    SELECT DISTINCT
+      concat('abfss://$ws@onelake.dfs.fabric.microsoft.com/$lh.Lakehouse/Files/', extracted_filepath) AS file
+    FROM read_csv('abfss://$ws@onelake.dfs.fabric.microsoft.com/$lh.Lakehouse/Files/Reports/Current/Dispatch_SCADA/download_log/*/*.csv', union_by_name = true)
+    WHERE extracted_filepath LIKE '%/parquet/record=DISPATCH_UNIT_SCADA/%'
+      AND parse_filename(extracted_filepath) NOT IN (SELECT DISTINCT file FROM scada_today)
+    ORDER BY file
+    LIMIT 500
+  )
+  SELECT list(file) FROM xxxx
+);
+-- Typed ZSTD Parquet landed by scraping(output_format='parquet'), one AEMO record type per file:
+-- no CSV parsing, and only the columns and row groups below are read
+SELECT
+  DUID,
+  CAST(SCADAVALUE AS double) AS INITIALMW,
+  CAST(0 AS double) AS INTERVENTION,
+  CAST(SETTLEMENTDATE AS TIMESTAMPTZ) AS SETTLEMENTDATE,
+  CAST(SETTLEMENTDATE AS date) AS date,
+  parse_filename(filename) AS file,
+  0 AS PRIORITY,
+  isoyear(CAST(SETTLEMENTDATE AS timestamp)) AS YEAR
+FROM read_parquet(getvariable('list_of_files_scada_today'), filename = true, union_by_name = true)
+WHERE SCADAVALUE != 0
+ORDER BY date
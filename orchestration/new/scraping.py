@@ -1,16 +1,33 @@
 import re
-import requests
-from urllib.request import urlopen
+import os
+import csv
+import json
+import hashlib
+import asyncio
+import multiprocessing
+import importlib.machinery
+import contextlib
+from urllib.parse import urlparse
 import io
 import zipfile
 import gzip
 import datetime
 import tempfile
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import shutil
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait
 from typing import List, Tuple
-import obstore
-from obstore.store import from_url
 import threading
+import time
+import random
+import uuid
+from collections import deque
+from http_transport import HttpTransport, RETRY_STATUSES, backoff_delay
+from run_metrics import RunMetrics, ScrapeResult, emit
+from archive_cache import ArchiveCache
+from storage import AlreadyExistsError, as_backend
+
+# GitHub contents API that tree URLs are listed through; benchmarks point it at a local stand-in
+GITHUB_API = "https://api.github.com"
 
 
 def is_github_tree_url(url: str) -> bool:
@@ -29,211 +46,1879 @@ def github_tree_to_api_url(url: str) -> str:
     branch_path_parts = branch_path.split("/", 1)
     branch = branch_path_parts[0]
     path = branch_path_parts[1] if len(branch_path_parts) > 1 else ""
-    return f"https://api.github.com/repos/{user}/{repo}/contents/{path}?ref={branch}"
+    return f"{GITHUB_API}/repos/{user}/{repo}/contents/{path}?ref={branch}"
+
+
+def extract_week_partition(filename: str) -> str:
+    match = re.search(r"(\d{4})(\d{2})(\d{2})", filename)
+    if match:
+        year, month, day = map(int, match.groups())
+        dt = datetime.date(year, month, day)
+        iso_year, iso_week, _ = dt.isocalendar()
+        return f"week={iso_year}_{iso_week:02d}"
+    return "week=unknown"
+
+
+def normalize_folder(folder: str) -> str:
+    clean_folder = folder.strip("/")
+    if clean_folder and not clean_folder.endswith("/"):
+        clean_folder += "/"
+    return clean_folder
+
+
+def parse_log_lines(log_content: str) -> List[str]:
+    """Return the data lines of download_log.csv (header and blank lines dropped)."""
+    lines = log_content.strip().splitlines()
+    return [line for line in lines[1:] if line.strip()]
+
+
+def parse_html_listing(html_content: str) -> List[str]:
+    scanner = ListingScanner()
+    return sorted(scanner.feed(html_content.encode("latin-1", "replace")) + scanner.close(), reverse=True)
+
+
+def parse_github_listing(items: list) -> Tuple[List[str], dict]:
+    """Return (zip names newest first, name -> download_url) from a GitHub contents API response."""
+    zip_files_info = []
+    for item in items:
+        if item.get("type") == "file" and item.get("name", "").endswith(".zip"):
+            zip_files_info.append((item["name"], item["download_url"]))
+
+    zip_files_info.sort(key=lambda x: x[0], reverse=True)
+    return [name for name, _ in zip_files_info], dict(zip_files_info)
+
+
+def watermark_key(filename: str):
+    """Sort key of an AEMO name by its embedded timestamp, or None for names without one."""
+    match = re.search(r"\d{8,14}", filename)
+    return (match.group(0).ljust(14, "0"), filename) if match else None
+
+
+class ListingScanner:
+    """
+    Incremental parser for an HTML directory listing fed as byte chunks.
+
+    feed() returns the new distinct .zip names of a chunk that pass `keep`
+    (all of them when keep is None). Once the listing is seen to run newest
+    first and a name is rejected, `stopped` is set and the rest of the
+    response can be dropped unread.
+    """
+
+    NAME_CHARS = re.compile(r"[\w.-]*$")
+    PATTERN = re.compile(r"[\w.-]+\.zip")
+
+    def __init__(self, keep=None):
+        self.keep = keep
+        self.stopped = False
+        self._carry = ""
+        self._seen = set()
+        self._previous = None
+        self._descending = False
+
+    def _scan(self, text: str) -> List[str]:
+        names = []
+        for name in self.PATTERN.findall(text):
+            if name in self._seen:
+                continue
+            self._seen.add(name)
+            key = watermark_key(name)
+            if key is not None:
+                if self._previous is not None and key < self._previous:
+                    self._descending = True
+                self._previous = key
+            if self.keep is None or self.keep(name):
+                names.append(name)
+            elif self._descending:
+                self.stopped = True
+                break
+        return names
+
+    def feed(self, chunk: bytes) -> List[str]:
+        if self.stopped:
+            return []
+        text = self._carry + chunk.decode("latin-1")
+        # Hold back a trailing partial name until the next chunk
+        cut = self.NAME_CHARS.search(text).start()
+        self._carry = text[cut:]
+        return self._scan(text[:cut])
+
+    def close(self) -> List[str]:
+        text, self._carry = self._carry, ""
+        return [] if self.stopped else self._scan(text)
+
+
+# Codecs DuckDB's read_csv decompresses natively, keyed by name: (file extension, default level, levels)
+CODECS = {
+    "gzip": (".gz", 6, range(1, 10)),
+    "zstd": (".zst", 3, range(1, 23)),
+}
+
+
+def codec_level(codec: str, level: int = None) -> int:
+    """Validate `codec` and `level`; returns the level to use (the codec default when None)."""
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec '{codec}', use one of {sorted(CODECS)}")
+    _, default_level, levels = CODECS[codec]
+    if level is None:
+        return default_level
+    if level not in levels:
+        raise ValueError(f"{codec} level must be between {levels.start} and {levels.stop - 1}, got {level}")
+    return level
+
+
+def compress_stream(source, target, member_name: str, chunk_size: int, codec: str = "gzip", level: int = None) -> None:
+    """Compress the file object `source` into the writable file object `target`, chunk by chunk."""
+    level = codec_level(codec, level)
+    if codec == "zstd":
+        import zstandard
+        with zstandard.ZstdCompressor(level=level).stream_writer(target, closefd=False) as zst:
+            shutil.copyfileobj(source, zst, chunk_size)
+    else:
+        with gzip.GzipFile(filename=member_name, mode="wb", fileobj=target, compresslevel=level) as gz:
+            shutil.copyfileobj(source, gz, chunk_size)
+
+
+class HashingReader:
+    """Read-through wrapper over a file object that feeds everything read to `digest`."""
+
+    def __init__(self, source, digest):
+        self.source = source
+        self.digest = digest
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.source.read(size)
+        self.digest.update(data)
+        return data
+
+
+def member_targets(clean_folder: str, filename: str, zf: zipfile.ZipFile, extension: str = ".gz"):
+    """Yield (zip_info, target path) for every file member of an archive."""
+    partition_folder = clean_folder + extract_week_partition(filename) + "/"
+    for zip_info in zf.infolist():
+        if zip_info.is_dir():
+            continue
+        yield zip_info, partition_folder + zip_info.filename + extension
+
+
+def recompress_archive(clean_folder: str, filename: str, spool, chunk_size: int, codec: str = "gzip",
+                       level: int = None):
+    """Yield (target path, compressed bytes, MD5 of the extracted member) for every member of a fetched archive."""
+    spool.seek(0)
+    with zipfile.ZipFile(spool, "r") as zf:
+        for zip_info, target in member_targets(clean_folder, filename, zf, CODECS[codec][0]):
+            digest = hashlib.md5()
+            with zf.open(zip_info) as extracted:
+                buffer = io.BytesIO()
+                compress_stream(HashingReader(extracted, digest), buffer, zip_info.filename, chunk_size, codec, level)
+            yield target, buffer.getvalue(), digest.hexdigest()
+
+
+def recompress_archive_bytes(clean_folder: str, filename: str, archive: bytes, chunk_size: int,
+                             codec: str = "gzip", level: int = None) -> List[Tuple[str, bytes, str]]:
+    """recompress_archive() over an in-memory archive, as a picklable call for a process pool."""
+    return list(recompress_archive(clean_folder, filename, io.BytesIO(archive), chunk_size, codec, level))
+
+
+def recompress_pool(workers: int = None):
+    """
+    Process pool for the recompress stage, or None to recompress on the calling threads.
+
+    Opt-in: workers=None or 0 keeps recompression in the stage threads. The
+    pool is started with forkserver (spawn where there is none), never
+    forked from this process, whose download and upload threads may hold
+    locks a forked child would inherit locked. Its workers import this
+    module by name, so a copy loaded from a URL (registered in sys.modules,
+    but not on sys.path) keeps recompressing in threads.
+    """
+    if not workers or workers <= 0:
+        return None
+    if importlib.machinery.PathFinder.find_spec(__name__) is None:
+        print(f"{__name__} is not importable from sys.path; recompressing in threads")
+        return None
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+
+
+# AEMO record types the SQL models read, as REPORT or REPORT_SUBREPORT from the I rows
+AEMO_RECORDS = ("DREGION", "DUNIT", "DISPATCH_PRICE", "DISPATCH_UNIT_SCADA")
+
+
+def split_records(source, workdir: str, records=AEMO_RECORDS) -> List[Tuple[str, str]]:
+    """
+    One pass over an AEMO multi-record CSV: the D rows of every wanted record
+    type go to their own single-schema CSV in `workdir`, headed by
+    REPORT,SUBREPORT,VERSION and the column names of the type's I row.
+    Returns (record type, csv path) pairs, one per record type and version.
+    """
+    outputs = {}  # (record type, version) -> (file, writer)
+    current = {}  # (report, subreport) -> writer of the version announced by the last I row
+    try:
+        for row in csv.reader(io.TextIOWrapper(source, encoding="utf-8", errors="replace", newline="")):
+            if not row:
+                continue
+            if row[0] == "I" and len(row) > 4:
+                record = f"{row[1]}_{row[2]}" if row[2] else row[1]
+                if record not in records:
+                    continue
+                if (record, row[3]) not in outputs:
+                    path = os.path.join(workdir, f"{record}.v{row[3]}.csv")
+                    f = open(path, "w", newline="")
+                    writer = csv.writer(f)
+                    writer.writerow(["REPORT", "SUBREPORT", "VERSION"] + row[4:])
+                    outputs[(record, row[3])] = (f, writer)
+                current[(row[1], row[2])] = outputs[(record, row[3])][1]
+            elif row[0] == "D" and len(row) > 3:
+                writer = current.get((row[1], row[2]))
+                if writer is not None:
+                    writer.writerow(row[1:])
+    finally:
+        for f, _ in outputs.values():
+            f.close()
+    return [(record, os.path.join(workdir, f"{record}.v{version}.csv")) for record, version in outputs]
+
+
+def records_to_parquet(csv_path: str, parquet_path: str) -> None:
+    """Type one split_records() CSV with DuckDB's sniffer and write it as ZSTD Parquet sorted by SETTLEMENTDATE."""
+    import duckdb
+
+    con = duckdb.connect()
+    try:
+        con.execute("SET threads = 2")
+        source = (f"read_csv('{csv_path}', header = true, sample_size = -1, "
+                  f"timestampformat = '%Y/%m/%d %H:%M:%S', null_padding = true)")
+        columns = [row[0] for row in con.execute(f"DESCRIBE SELECT * FROM {source}").fetchall()]
+        # Sorted rows keep each row group's SETTLEMENTDATE min/max statistics tight for pruning
+        order = " ORDER BY SETTLEMENTDATE" if "SETTLEMENTDATE" in columns else ""
+        con.execute(f"COPY (SELECT * FROM {source}{order}) TO '{parquet_path}' "
+                    f"(FORMAT parquet, COMPRESSION zstd, ROW_GROUP_SIZE 1000000)")
+    finally:
+        con.close()
+
+
+def transform_archive(clean_folder: str, filename: str, spool, records=AEMO_RECORDS):
+    """
+    Yield (parquet path, bytes, MD5 of the bytes) per record type and member
+    of a fetched archive: <folder>parquet/record=<TYPE>/<week>/<member>.parquet,
+    typed, ZSTD compressed. An archive holding none of `records` yields
+    (None, None, None), so it is still recorded in the manifest and not
+    fetched again.
+    """
+    spool.seek(0)
+    week = extract_week_partition(filename)
+    produced = False
+    with zipfile.ZipFile(spool, "r") as zf, tempfile.TemporaryDirectory() as workdir:
+        for zip_info, _ in member_targets(clean_folder, filename, zf):
+            stem = zip_info.filename.rsplit("/", 1)[-1].rsplit(".", 1)[0]
+            with zf.open(zip_info) as extracted:
+                split = split_records(extracted, workdir, records)
+            seen = set()
+            for record, csv_path in split:
+                # A second version of a record type in the same file gets its own object
+                suffix = f".{os.path.basename(csv_path).split('.')[1]}" if record in seen else ""
+                seen.add(record)
+                parquet_path = csv_path[:-4] + ".parquet"
+                records_to_parquet(csv_path, parquet_path)
+                with open(parquet_path, "rb") as f:
+                    data = f.read()
+                os.remove(csv_path)
+                os.remove(parquet_path)
+                produced = True
+                yield (f"{clean_folder}parquet/record={record}/{week}/{stem}{suffix}.parquet", data,
+                       hashlib.md5(data).hexdigest())
+    if not produced:
+        yield None, None, None
+
+
+def extract_month_key(filename: str) -> str:
+    match = re.search(r"(\d{4})(\d{2})\d{2}", filename)
+    return f"{match.group(1)}{match.group(2)}" if match else "unknown"
+
+
+class DownloadManifest:
+    """
+    Append-only ingestion log for one folder, replacing the download_log.csv rewrite.
+
+    Layout under <folder>download_log/:
+        month=YYYYMM/part-<utc>-<id>.csv   immutable segments, one row per extracted member
+        month=YYYYMM/snapshot-<version>.csv  compacted state of the partition
+        _legacy_imported                   marker written once download_log.csv has been split in
+
+    Rows are zip_filename,extracted_filepath,member_offset,member_length. The
+    last two locate a member inside a Bundler object and are empty when the
+    member has an object of its own; older two-column rows are padded when a
+    partition is merged. SQL reads the manifest with union_by_name = true.
+
+    Each run writes one new segment per month it touched. A lookup only reads
+    the month partitions of the names being checked, and a partition is merged
+    into a new snapshot once it holds more than merge_threshold segments, so
+    per-run cost does not grow with history. SQL reads the whole manifest as
+    one table: '<folder>download_log/*/*.csv'.
+
+    Every write is a create-only conditional put, so concurrent writers
+    (threads, notebook sessions, the UDF) need no lock: segments have unique
+    names, and a merge commits snapshot-<n+1> only if nobody else did first,
+    otherwise it re-reads the winner's snapshot and retries. Inputs are deleted
+    only after the snapshot that contains them is committed.
+    """
+
+    HEADER = "zip_filename,extracted_filepath,member_offset,member_length"
+    COLUMNS = HEADER.count(",") + 1
+
+    def __init__(self, store, folder: str, merge_threshold: int = 16, max_attempts: int = 10):
+        self.store = as_backend(store)
+        self.folder = normalize_folder(folder)
+        self.root = self.folder + "download_log/"
+        self.merge_threshold = merge_threshold
+        self.max_attempts = max_attempts
+        self._index = {}  # month -> set of zip names seen in that partition
+
+    def _partition(self, month: str) -> Tuple[List[str], List[str]]:
+        """Return (snapshots oldest first, segments) of a month partition."""
+        paths = [meta["path"] for meta in self.store.list(f"{self.root}month={month}/")
+                 if meta["path"].endswith(".csv")]
+        snapshots = sorted(p for p in paths if p.rsplit("/", 1)[-1].startswith("snapshot-"))
+        segments = [p for p in paths if p not in snapshots]
+        return snapshots, segments
+
+    def _read_lines(self, path: str) -> List[str]:
+        return parse_log_lines(self.store.get(path).decode("utf-8"))
+
+    def _read_partition(self, month: str) -> Tuple[List[str], List[str], List[str]]:
+        """Return (snapshots, segments, lines) from one consistent listing of a partition."""
+        for _ in range(self.max_attempts):
+            snapshots, segments = self._partition(month)
+            try:
+                # Older snapshots are subsets of the latest one
+                lines = [line for path in snapshots[-1:] + segments for line in self._read_lines(path)]
+                return snapshots, segments, lines
+            except FileNotFoundError:
+                continue  # a merge committed and cleaned up under us, list again
+        raise RuntimeError(f"{self.root}month={month}/ kept changing while being read")
+
+    def _put_new(self, path: str, lines: List[str]) -> None:
+        lines = [line + "," * (self.COLUMNS - 1 - line.count(",")) for line in lines]
+        self.store.put(path, (self.HEADER + "\n" + "\n".join(lines) + "\n").encode("utf-8"), mode="create")
+
+    def _write_segment(self, month: str, lines: List[str]) -> str:
+        stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        path = f"{self.root}month={month}/part-{stamp}-{uuid.uuid4().hex[:8]}.csv"
+        self._put_new(path, lines)
+        return path
+
+    @staticmethod
+    def _snapshot_path(root: str, month: str, version: int) -> str:
+        return f"{root}month={month}/snapshot-{version:08d}.csv"
+
+    def import_legacy_log(self) -> None:
+        """Split an existing download_log.csv into month partitions, once per folder."""
+        marker = self.root + "_legacy_imported"
+        try:
+            self.store.head(marker)
+            return
+        except FileNotFoundError:
+            pass
+        try:
+            legacy = self._read_lines(self.folder + "download_log.csv")
+        except FileNotFoundError:
+            legacy = []
+        by_month = {}
+        for line in legacy:
+            by_month.setdefault(extract_month_key(line.split(",", 1)[0]), []).append(line)
+        for month, lines in by_month.items():
+            # Version 0 has a fixed name, so concurrent imports of the same log are idempotent
+            try:
+                self._put_new(self._snapshot_path(self.root, month, 0), lines)
+            except AlreadyExistsError:
+                pass
+        self.store.put(marker, f"{len(legacy)} entries imported\n".encode("utf-8"))
+        if legacy:
+            print(f"Imported {len(legacy)} entries from {self.folder}download_log.csv into {self.root}")
+
+    def downloaded(self, filenames: List[str]) -> set:
+        """Return the subset of `filenames` already recorded in the manifest."""
+        self.import_legacy_log()
+        months = {extract_month_key(f) for f in filenames}
+        for month in months - self._index.keys():
+            _, _, lines = self._read_partition(month)
+            self._index[month] = {line.split(",", 1)[0].strip() for line in lines}
+        return {f for f in filenames if f in self._index[extract_month_key(f)]}
+
+    def append(self, entries: List[tuple]) -> None:
+        """Record (zip_filename, extracted_filepath[, member_offset, member_length]) entries as new segments."""
+        by_month = {}
+        for entry in entries:
+            by_month.setdefault(extract_month_key(entry[0]), []).append(",".join(str(field) for field in entry))
+        for month, lines in by_month.items():
+            self._write_segment(month, lines)
+            if month in self._index:
+                self._index[month].update(line.split(",", 1)[0] for line in lines)
+            if len(self._partition(month)[1]) > self.merge_threshold:
+                self.merge(month)
+
+    def merge(self, month: str) -> None:
+        """Fold the segments of a month partition into a new snapshot (optimistic retry loop)."""
+        for attempt in range(self.max_attempts):
+            snapshots, segments, lines = self._read_partition(month)
+            if not segments:
+                return
+            version = int(snapshots[-1].rsplit("-", 1)[-1][:-4]) + 1 if snapshots else 1
+            lines = {line + "," * (self.COLUMNS - 1 - line.count(",")) for line in lines}
+            try:
+                self._put_new(self._snapshot_path(self.root, month, version), sorted(lines))
+            except AlreadyExistsError:
+                # Another writer committed this version first: merge on top of theirs
+                time.sleep(random.uniform(0, 0.05 * (attempt + 1)))
+                continue
+            # Readers may briefly see duplicates (the SQL models select DISTINCT) but never miss an entry
+            for path in segments + snapshots:
+                try:
+                    self.store.delete(path)
+                except FileNotFoundError:
+                    pass
+            print(f"Merged {len(segments)} segments of {self.root}month={month}/ into snapshot {version}")
+            return
+        print(f"Gave up merging {self.root}month={month}/ after {self.max_attempts} attempts, will retry next run")
+
+
+class ListingCache:
+    """
+    Last listing of each URL a folder is fed from, for conditional GETs.
+
+    Stored at <folder>download_log/_listing/<sha1 of url>.json with the
+    response's ETag/Last-Modified, the parsed zip names (and GitHub download
+    URLs), and whether every listed file has been ingested. The next listing
+    sends If-None-Match/If-Modified-Since; on 304 the parsed list is reused,
+    and if nothing was left pending the URL is skipped without touching the
+    manifest. Servers that send neither validator are never cached.
+    """
+
+    def __init__(self, store, folder: str):
+        self.store = as_backend(store)
+        self.root = normalize_folder(folder) + "download_log/_listing/"
+
+    def _path(self, url: str) -> str:
+        return self.root + hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json"
+
+    def load(self, url: str) -> dict:
+        """Return the cached entry for `url`, or {} if there is none (or it cannot be read)."""
+        try:
+            entry = json.loads(self.store.get(self._path(url)))
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Ignoring unreadable listing cache for {url}: {e}")
+            return {}
+        if entry.get("url") != url:
+            return {}
+        entry["saved"] = True
+        return entry
+
+    @staticmethod
+    def request_headers(entry: dict) -> dict:
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    @staticmethod
+    def entry(url: str, headers, files: List[str], zip_url_map: dict = None) -> dict:
+        """Build an entry from a 200 listing response; `complete` is set once its files are ingested."""
+        return {"url": url, "etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified"),
+                "files": files, "zip_url_map": zip_url_map, "complete": False}
+
+    def save(self, entry: dict, complete: bool) -> None:
+        """Persist `entry` if it has validators and its state changed; a failed write only costs a full listing."""
+        if not (entry.get("etag") or entry.get("last_modified")):
+            return
+        if entry.get("saved") and entry["complete"] == complete:
+            return
+        record = {k: v for k, v in entry.items() if k != "saved"}
+        record["complete"] = complete
+        try:
+            self.store.put(self._path(entry["url"]), json.dumps(record).encode("utf-8"))
+        except Exception as e:
+            print(f"Could not update listing cache for {entry['url']}: {e}")
+
+
+class Watermark:
+    """
+    Highest name of a URL's listing below which everything has been ingested.
+
+    AEMO names embed a sortable timestamp, so once a name is ingested (and
+    nothing older is pending) older names need not be listed or looked up
+    again: a run only considers names above the watermark, and its work is
+    proportional to what was published since. Stored at
+    <folder>download_log/_watermark/<sha1 of url>.json.
+
+    The watermark only advances over a contiguous run of ingested names, so
+    files held back by totalfiles or a failed download stay above it. A name
+    published late below the watermark would still be missed, so every
+    `reconcile_hours` a run ignores the watermark and does the full diff of
+    the listing against the manifest.
+    """
+
+    def __init__(self, store, folder: str, url: str, reconcile_hours: float = 24):
+        self.store = as_backend(store)
+        self.url = url
+        self.path = (normalize_folder(folder) + "download_log/_watermark/"
+                     + hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+        self.reconcile_hours = reconcile_hours
+        self.name = None
+        self.reconciled_at = None
+
+    def load(self) -> "Watermark":
+        try:
+            record = json.loads(self.store.get(self.path))
+            self.name = record.get("watermark")
+            self.reconciled_at = datetime.datetime.fromisoformat(record["reconciled_at"])
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Ignoring unreadable watermark for {self.url}: {e}")
+        return self
+
+    @property
+    def reconcile_due(self) -> bool:
+        if self.name is None or self.reconciled_at is None:
+            return True
+        age = datetime.datetime.now(datetime.timezone.utc) - self.reconciled_at
+        return age > datetime.timedelta(hours=self.reconcile_hours)
+
+    def above(self, filename: str) -> bool:
+        """True if `filename` still needs a manifest lookup (names without a timestamp always do)."""
+        key = watermark_key(filename)
+        return self.name is None or key is None or key > watermark_key(self.name)
+
+    def advance(self, candidates: List[str], done: set, reconciled: bool) -> None:
+        """Move the watermark over the oldest candidates that are all in `done`, and save it."""
+        name = self.name
+        for candidate in sorted((f for f in candidates if watermark_key(f) is not None), key=watermark_key):
+            if candidate not in done:
+                break
+            if name is None or watermark_key(candidate) > watermark_key(name):
+                name = candidate
+        if name == self.name and not reconciled:
+            return
+        # Runs are always reconciling until a first record exists, so reconciled_at is set here
+        reconciled_at = datetime.datetime.now(datetime.timezone.utc) if reconciled else self.reconciled_at
+        record = {"url": self.url, "watermark": name, "reconciled_at": reconciled_at.isoformat()}
+        try:
+            self.store.put(self.path, json.dumps(record).encode("utf-8"))
+            self.name, self.reconciled_at = name, reconciled_at
+        except Exception as e:
+            print(f"Could not update watermark for {self.url}: {e}")
+
+
+class ChecksumIndex:
+    """
+    Sidecar index of uploaded objects, for skipping identical uploads and
+    recovering from a crash between the uploads and the manifest commit.
+
+    Layout under <folder>download_log/_checksums/:
+        week=YYYY_WW/chunk-<utc>-<id>.json   immutable, {"entries": [...]}
+
+    An entry is one member of a source zip: zip, object path, MD5 of the
+    extracted member (of the Parquet object with output_format="parquet";
+    None for bundled members), object size, and the member's offset/length
+    inside a bundle. Entries are partitioned by the week of their zip, like
+    the objects themselves, so a lookup reads only the weeks it needs, and a
+    week is folded into one chunk once it holds more than merge_threshold.
+
+    A zip's entries are only written once all of its members are uploaded
+    (expect() gives the count), in chunks of `flush_every` entries and at
+    flush(), which runs before the manifest is committed. A run that dies
+    after its uploads leaves its zips here but not in the manifest;
+    recover() hands them back as manifest entries if their objects are still
+    there, so the next run does not download them again. Losing a chunk
+    only costs a re-upload, so writes and merges are plain, unconditional.
+    """
+
+    def __init__(self, store, folder: str, flush_every: int = 32, merge_threshold: int = 16):
+        self.store = as_backend(store)
+        self.root = normalize_folder(folder) + "download_log/_checksums/"
+        self.flush_every = flush_every
+        self.merge_threshold = merge_threshold
+        self._weeks = {}  # week -> {object path: [entries]}
+        self._expected = {}  # zip -> member count, set once its archive is fully recompressed
+        self._open = {}  # zip -> entries of the members uploaded so far
+        self._ready = []  # entries of complete zips, not yet written
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def _chunks(self, week: str) -> List[str]:
+        return [meta["path"] for meta in self.store.list(f"{self.root}{week}/")
+                if meta["path"].endswith(".json")]
+
+    def _read(self, path: str) -> list:
+        try:
+            return json.loads(self.store.get(path))["entries"]
+        except FileNotFoundError:
+            return []  # merged away between the listing and the read
+
+    def _write(self, week: str, entries: list) -> None:
+        stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        path = f"{self.root}{week}/chunk-{stamp}-{uuid.uuid4().hex[:8]}.json"
+        self.store.put(path, json.dumps({"entries": entries}).encode("utf-8"))
+
+    def _load(self, week: str) -> dict:
+        with self._load_lock:
+            if week not in self._weeks:
+                by_path = {}
+                for path in self._chunks(week):
+                    for entry in self._read(path):
+                        by_path.setdefault(entry["path"], []).append(entry)
+                self._weeks[week] = by_path
+            return self._weeks[week]
+
+    def unchanged(self, path: str, zip_filename: str, checksum: str) -> bool:
+        """True if `path` already holds a member with this checksum (verified with a HEAD of its size)."""
+        if checksum is None:
+            return False
+        entries = self._load(extract_week_partition(zip_filename)).get(path, [])
+        sizes = {e["size"] for e in entries if e["md5"] == checksum and e["offset"] is None}
+        if not sizes:
+            return False
+        try:
+            return self.store.head(path)["size"] in sizes
+        except FileNotFoundError:
+            return False
+
+    def recover(self, filenames: List[str]) -> List[tuple]:
+        """Manifest entries for the `filenames` fully indexed whose objects all still exist."""
+        by_zip = {}
+        for week in {extract_week_partition(f) for f in filenames}:
+            for entries in self._load(week).values():
+                for entry in entries:
+                    by_zip.setdefault(entry["zip"], {})[(entry["path"], entry["offset"])] = entry
+        sizes = {}
+        recovered = []
+        for filename in filenames:
+            members = list(by_zip.get(filename, {}).values())
+            if not members:
+                continue
+            try:
+                for entry in members:
+                    if entry["path"] and entry["path"] not in sizes:
+                        sizes[entry["path"]] = self.store.head(entry["path"])["size"]
+            except FileNotFoundError:
+                continue
+            # Streamed members are recorded without a size: existence is all that can be checked
+            if all(not e["path"] or e["size"] is None or sizes[e["path"]] == e["size"] for e in members):
+                for e in members:
+                    recovered.append((filename, e["path"]) if e["offset"] is None
+                                     else (filename, e["path"], e["offset"], e["length"]))
+        return recovered
+
+    def expect(self, zip_filename: str, members: int) -> None:
+        """Declare how many members `zip_filename` has; its entries are written once all are recorded."""
+        with self._lock:
+            self._expected[zip_filename] = members
+            self._complete(zip_filename)
+        self._flush_if_full()
+
+    def record(self, zip_filename: str, path: str, checksum: str = None, size: int = 0, offset: int = None,
+               length: int = None) -> None:
+        """Record one uploaded member; path "" marks a zip with nothing to land (see transform_archive)."""
+        entry = {"zip": zip_filename, "path": path, "md5": checksum, "size": size, "offset": offset,
+                 "length": length}
+        with self._lock:
+            self._open.setdefault(zip_filename, []).append(entry)
+            self._complete(zip_filename)
+        self._flush_if_full()
+
+    def _complete(self, zip_filename: str) -> None:
+        entries = self._open.get(zip_filename, [])
+        if zip_filename in self._expected and len(entries) >= self._expected[zip_filename]:
+            self._ready.extend(self._open.pop(zip_filename, []))
+            del self._expected[zip_filename]
+
+    def _flush_if_full(self) -> None:
+        if len(self._ready) >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the entries of every complete zip; a failed write is reported and only costs a re-upload."""
+        with self._flush_lock:
+            with self._lock:
+                ready, self._ready = self._ready, []
+            by_week = {}
+            for entry in ready:
+                by_week.setdefault(extract_week_partition(entry["zip"]), []).append(entry)
+            for week, entries in by_week.items():
+                try:
+                    self._write(week, entries)
+                    with self._load_lock:
+                        for entry in entries:
+                            self._weeks.get(week, {}).setdefault(entry["path"], []).append(entry)
+                    if len(self._chunks(week)) > self.merge_threshold:
+                        self.merge(week)
+                except Exception as e:
+                    print(f"Could not update checksum index {self.root}{week}/: {e}")
+
+    def merge(self, week: str) -> None:
+        """Fold a week's chunks into one; inputs are deleted only after the merged chunk is written."""
+        chunks = self._chunks(week)
+        entries = {}
+        for path in chunks:
+            for entry in self._read(path):
+                entries[(entry["zip"], entry["path"], entry["offset"])] = entry
+        self._write(week, list(entries.values()))
+        for path in chunks:
+            try:
+                self.store.delete(path)
+            except FileNotFoundError:
+                pass
+
+
+class Bundler:
+    """
+    Coalesces recompressed members into multi-member objects per partition folder.
+
+    gzip members and zstd frames concatenate into a stream that decompresses
+    as the members one after another, so a bundle is read by read_csv like
+    any other .CSV.gz/.CSV.zst (each member keeps its own C/I header rows,
+    which the SQL models already filter out). add() returns a sealed bundle
+    once a partition holds `target_bytes`, flush() seals the rest; a sealed
+    bundle is (path, data, manifest entries) and every entry records the
+    member's byte offset and length inside it. Bundles are never appended
+    to, so a bundle name recorded as ingested stays exact.
+
+    Memory: up to target_bytes of compressed data per open partition.
+    """
+
+    def __init__(self, target_bytes: int, extension: str):
+        self.target_bytes = target_bytes
+        self.extension = extension
+        self._lock = threading.Lock()
+        self._open = {}  # partition folder -> ([data], [(zip_filename, offset, length)], size)
+
+    def _seal(self, partition: str, parts: list, members: list) -> Tuple[str, bytes, list]:
+        stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        path = f"{partition}bundle-{stamp}-{uuid.uuid4().hex[:8]}.CSV{self.extension}"
+        return path, b"".join(parts), [(zip_name, path, offset, length) for zip_name, offset, length in members]
+
+    def add(self, zip_filename: str, member_path: str, data: bytes):
+        """Queue one recompressed member; returns a sealed bundle when its partition is full, else None."""
+        partition = member_path.rsplit("/", 1)[0] + "/"
+        with self._lock:
+            parts, members, size = self._open.get(partition, ([], [], 0))
+            parts.append(data)
+            members.append((zip_filename, size, len(data)))
+            size += len(data)
+            if size < self.target_bytes:
+                self._open[partition] = (parts, members, size)
+                return None
+            self._open.pop(partition, None)
+        return self._seal(partition, parts, members)
 
+    def flush(self) -> List[Tuple[str, bytes, list]]:
+        with self._lock:
+            pending, self._open = self._open, {}
+        return [self._seal(partition, parts, members) for partition, (parts, members, _) in pending.items()]
 
-def scraping(urls: List[str], folders: List[str], totalfiles: int, ws: str, lh: str, max_workers: int) -> int:
+
+class ByteBoundedQueue:
+    """FIFO between pipeline stages, bounded by the total payload bytes it holds."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items = deque()
+        self._bytes = 0
+        self._cond = threading.Condition()
+
+    def put(self, item, nbytes: int) -> None:
+        with self._cond:
+            # An item larger than max_bytes is still admitted into an empty queue
+            while self._items and self._bytes + nbytes > self.max_bytes:
+                self._cond.wait()
+            self._items.append((item, nbytes))
+            self._bytes += nbytes
+            self._cond.notify_all()
+
+    def get(self):
+        with self._cond:
+            while not self._items:
+                self._cond.wait()
+            item, nbytes = self._items.popleft()
+            self._bytes -= nbytes
+            self._cond.notify_all()
+            return item
+
+
+class ByteBudget:
+    """Payload bytes handed on by one stage and not yet finished by the next, at most max_bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.used = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, nbytes: int) -> int:
+        """Wait until nbytes fit; returns the amount to release (an item over max_bytes holds all of it)."""
+        nbytes = min(nbytes, self.max_bytes)
+        with self._cond:
+            self._cond.wait_for(lambda: self.used + nbytes <= self.max_bytes)
+            self.used += nbytes
+        return nbytes
+
+    def release(self, nbytes: int) -> None:
+        with self._cond:
+            self.used -= nbytes
+            self._cond.notify_all()
+
+
+class TimeBudget:
+    """
+    Admission of new files under a wall-clock budget, for callers with an
+    execution limit such as a UDF: no file starts once the time left, less a
+    margin for the manifest commits, is below the p95 of the per-file times
+    seen so far (30 s, a read timeout, before the first). seconds=None
+    admits everything.
+    """
+
+    def __init__(self, seconds: float = None):
+        self.seconds = seconds
+        self.deadline = time.monotonic() + seconds if seconds is not None else None
+        self.margin = min(10.0, 0.05 * seconds) if seconds is not None else 0.0
+        self._durations = []
+        self._lock = threading.Lock()
+
+    def admit(self) -> bool:
+        if self.deadline is None:
+            return True
+        with self._lock:
+            ordered = sorted(self._durations)
+        p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] if ordered else 30.0
+        return self.deadline - time.monotonic() - self.margin > p95
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._durations.append(seconds)
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for one pipeline stage, shared by every URL of a run.
+
+    Starts at `initial` and moves between `floor` and `ceiling` as work
+    completes: +1 per window of `limit` clean completions (additive
+    increase); x`backoff` on a failed, throttled or retried request
+    (multiplicative decrease, at most once per window, so a burst of
+    failures from one overloaded moment counts once); x0.9 when the smoothed
+    seconds per MiB run above `latency_tolerance` times the best recently
+    seen plus 50 ms of jitter (requests queueing at the server, or threads
+    at the node's CPU);
+    and -1 when a window's throughput fell by a quarter after an increase.
+    With floor == ceiling it is a plain fixed limit.
+
+    Usage:
+        with limiter.slot() as outcome:
+            ...
+            outcome["bytes"] = size        # for throughput and latency per MiB
+            outcome["throttled"] = True    # 429/5xx or retries seen
+            outcome["ok"] = False          # failed without raising
     """
-    Optimized download function using obstore for OneLake operations.
+
+    def __init__(self, floor: int = 1, ceiling: int = 32, initial: int = None, backoff: float = 0.5,
+                 latency_tolerance: float = 2.5):
+        self.floor = max(1, floor)
+        self.ceiling = max(self.floor, ceiling)
+        self.initial = min(self.ceiling, max(self.floor, initial or self.floor))
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.limit = float(self.initial)
+        self.peak = self.initial
+        self.increases = 0
+        self.decreases = 0
+        self._inflight = 0
+        self._epoch = 0  # bumped by every decrease; completions started before it are not counted again
+        self._best = None
+        self._ewma = None
+        self._window_done = 0
+        self._window_bytes = 0
+        self._window_start = time.perf_counter()
+        self._window_grew = False
+        self._last_throughput = None
+        self._started = time.perf_counter()
+        self.history = [(0.0, self.initial)]  # (seconds into the run, limit) at every change
+        self._cond = threading.Condition()
+
+    def _set(self, limit: float) -> None:
+        before = int(self.limit)
+        self.limit = min(float(self.ceiling), max(float(self.floor), limit))
+        if int(self.limit) != before:
+            self.history.append((round(time.perf_counter() - self._started, 3), int(self.limit)))
+            self.peak = max(self.peak, int(self.limit))
+
+    def _decrease(self, factor: float) -> None:
+        if self.limit > self.floor:
+            self.decreases += 1
+        self._set(self.limit * factor)
+        self._epoch += 1
+        self._window_grew = False
+
+    def _end_window(self) -> None:
+        now = time.perf_counter()
+        throughput = self._window_bytes / max(now - self._window_start, 1e-6)
+        if self._window_grew and self._last_throughput and throughput < 0.75 * self._last_throughput:
+            self._set(self.limit - 1)  # more workers made it slower: give the increase back
+        self._last_throughput = throughput
+        self._window_done, self._window_bytes, self._window_start = 0, 0, now
+        self._window_grew = False
+
+    def acquire(self) -> int:
+        with self._cond:
+            while self._inflight >= int(self.limit):
+                self._cond.wait()
+            self._inflight += 1
+            return self._epoch
+
+    def release(self, epoch: int, seconds: float, nbytes: int, ok: bool = True, throttled: bool = False) -> None:
+        with self._cond:
+            self._inflight -= 1
+            if not ok or throttled:
+                if epoch == self._epoch:
+                    self._decrease(self.backoff)
+            else:
+                cost = seconds / max(nbytes / 2 ** 20, 1.0)
+                # The best cost drifts up 1% per completion, so a lasting slowdown becomes the new baseline
+                self._best = cost if self._best is None else min(cost, self._best * 1.01)
+                self._ewma = cost if self._ewma is None else 0.8 * self._ewma + 0.2 * cost
+                if self._ewma > self.latency_tolerance * self._best + 0.05 and epoch == self._epoch:
+                    self._decrease(0.9)
+                elif self.limit < self.ceiling:
+                    before = int(self.limit)
+                    self._set(self.limit + 1 / self.limit)
+                    self.increases += int(self.limit) > before
+                    self._window_grew = True
+                self._window_done += 1
+                self._window_bytes += nbytes
+                if self._window_done >= int(self.limit):
+                    self._end_window()
+            self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def slot(self):
+        epoch = self.acquire()
+        outcome = {"bytes": 0, "ok": True, "throttled": False, "limit": int(self.limit)}
+        start = time.perf_counter()
+        try:
+            yield outcome
+        except BaseException:
+            outcome["ok"] = False
+            raise
+        finally:
+            self.release(epoch, time.perf_counter() - start, outcome["bytes"], outcome["ok"], outcome["throttled"])
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"floor": self.floor, "ceiling": self.ceiling, "initial": self.initial, "limit": int(self.limit),
+                    "peak": self.peak, "increases": self.increases, "decreases": self.decreases,
+                    "history": list(self.history)}
+
+
+def scraping(urls: List[str], folders: List[str], totalfiles: int, ws: str, lh: str, max_workers: int,
+             streaming: bool = False, chunk_size: int = 8 * 1024 * 1024, store=None,
+             max_inflight_bytes: int = 256 * 1024 * 1024, http: HttpTransport = None,
+             codec: str = "gzip", level: int = None, recompress_workers: int = None,
+             watermark: bool = True, reconcile_hours: float = 24, bundle_bytes: int = 0,
+             output_format: str = "csv", metrics_sink=None, adaptive: bool = True,
+             min_file_workers: int = 2, max_file_workers: int = 32, checksums: bool = True,
+             archive_cache=None, time_budget: float = None, commit_every: int = 0) -> int:
+    """
+    Optimized download function for OneLake operations.
 
     Supports:
       - Regular HTML directory listings (original behavior)
       - GitHub tree URLs (e.g., https://github.com/user/repo/tree/branch/path)
 
+    Files flow through fetch -> recompress -> upload stages connected by queues
+    holding at most max_inflight_bytes in total, so uploads start while other
+    files are still downloading.
+
+    Streaming mode (streaming=True) keeps peak memory per file at O(chunk_size):
+    the archive is spooled to a temp file in chunk_size reads, each member is
+    gzipped chunk by chunk and written straight to a multipart upload.
+    `store` overrides the OneLake store: an obstore store (e.g. a LocalStore
+    for benchmarks) or any storage.StorageBackend, such as a
+    FabricFilesBackend over a lakehouse connection or a LocalBackend.
+
+    All HTTP goes through one HttpTransport (keep-alive pool sized to the
+    workers, retries with backoff on 429/5xx); pass `http` to share or
+    configure it, its stats are printed with the summary.
+
+    Extracted CSVs are written with `codec` ("gzip", levels 1-9, default 6,
+    or "zstd", levels 1-22, default 3, as .zst); DuckDB's read_csv reads
+    both. The recompress stage runs on its own threads; with
+    `recompress_workers` > 0 it moves to a pool of that many processes
+    (see recompress_pool) so it does not compete with the network threads
+    for the GIL. Streaming mode always recompresses in the file's own thread.
+
+    With `watermark` (the default), a URL's listing is scanned as it streams
+    in and only names above its Watermark are looked up in the manifest, so
+    a run costs O(new files) instead of O(history). Every `reconcile_hours`
+    a run does the full listing/manifest diff instead, to catch gaps.
+
+    With `bundle_bytes` > 0 the members of a run are coalesced per week
+    partition into bundle objects of about that size (see Bundler) instead
+    of one tiny object per 5-minute interval; the manifest maps every source
+    zip to its bundle and byte range. Streaming mode does not bundle.
+
+    With output_format="parquet" each member is split by AEMO record type
+    (AEMO_RECORDS) in one pass and landed as typed, ZSTD Parquet under
+    <folder>parquet/record=<TYPE>/ instead of re-gzipped CSV, for the
+    <model>__parquet.sql variants of the SQL models. The conversion runs in
+    DuckDB on the recompress threads (no process pool, no bundling).
+
+    Every run records per-URL and per-file spans (listing, manifest reads
+    and writes, download, queue waits, recompress, upload) with wall time,
+    bytes in/out and HTTP retries in a RunMetrics, prints the per-phase
+    totals with the summary and hands it to `metrics_sink` if given, e.g.
+    run_metrics.delta_sink(table_uri) or run_metrics.parquet_sink(store).
+
+    Downloads and uploads each run on one thread pool and under one
+    AdaptiveLimiter shared by all URLs: with `adaptive` (the default) the
+    number in flight starts at 8 and follows throughput, latency and
+    throttling between `min_file_workers` and `max_file_workers`; otherwise
+    it stays at 8 per concurrent URL (max_workers), within the same bounds.
+    The levels chosen are in the run metrics.
+
+    With `checksums` (the default) every uploaded member is recorded in a
+    ChecksumIndex with the MD5 of its content: an upload whose target
+    already holds the same content is skipped (streaming mode cannot know
+    before it uploads), and files a crashed run uploaded but never wrote to
+    the manifest are committed from the index instead of fetched again.
+
+    `archive_cache` (an ArchiveCache, or a directory to open one in) keeps
+    every downloaded archive on local disk, so re-processing a week with a
+    new partitioning or codec, or a backfill, reads the archives from there
+    instead of the internet: a cached archive is revalidated with a
+    conditional GET (or not at all with revalidate=False). Hits are the
+    archive_cache spans of the run metrics.
+
+    With `time_budget` (seconds) no new file starts once the time left is
+    below the p95 of the per-file times so far, from the start of a file's
+    download to the end of its last upload (TimeBudget), so a caller with an
+    execution limit gets its partial progress committed in time; the files
+    not started stay pending for the next run. With `commit_every` the
+    manifest is committed each time that many more files are fully uploaded
+    instead of once per URL at the end, so a run cut off by its host loses
+    at most one batch (not with bundle_bytes, whose bundles only complete at
+    the end).
+
     Returns:
-        int: 1 if files were successfully downloaded, 0 if error or no new files
+        ScrapeResult: an int, 1 if files were successfully downloaded, 0 if
+        error or no new files, with the run's RunMetrics on `.metrics`
     """
-    store = from_url(f'abfss://{ws}@onelake.dfs.fabric.microsoft.com/{lh}.Lakehouse/Files')
+    if store is None:
+        from obstore.store import from_url
+        store = from_url(f'abfss://{ws}@onelake.dfs.fabric.microsoft.com/{lh}.Lakehouse/Files')
+    store = as_backend(store)
+    level = codec_level(codec, level)
+    extension = CODECS[codec][0]
+    if output_format not in ("csv", "parquet"):
+        raise ValueError(f"Unknown output_format '{output_format}', use 'csv' or 'parquet'")
+    parquet = output_format == "parquet"
+    if adaptive:
+        download_limit = AdaptiveLimiter(min_file_workers, max_file_workers, initial=8)
+        upload_limit = AdaptiveLimiter(min_file_workers, max_file_workers, initial=8)
+    else:
+        # 8 files per URL in flight, as each URL ran before the limits were shared
+        fixed = max(min_file_workers, min(max_file_workers, 8 * max(1, min(max_workers, len(urls)))))
+        download_limit, upload_limit = AdaptiveLimiter(fixed, fixed), AdaptiveLimiter(fixed, fixed)
+    own_http = http is None
+    if own_http:
+        # The download limiter, not the pool, decides how many requests are in flight
+        http = HttpTransport(pool_size=max(8, download_limit.ceiling, max_workers * 8))
     summary = []
     total_files_processed = 0
-    
-    # Thread lock for log operations
-    log_lock = threading.Lock()
+    metrics = RunMetrics("streaming" if streaming else "threaded")
+    cache = ArchiveCache(archive_cache) if isinstance(archive_cache, str) else archive_cache
+    budget = TimeBudget(time_budget)
+
+    # No log lock: DownloadManifest commits with conditional puts, so URLs writing to
+    # different folders (or other sessions writing to the same one) proceed in parallel
 
     def process_url(url_folder_pair: Tuple[str, str]) -> Tuple[str, int]:
         url, folder = url_folder_pair
 
-        clean_folder = folder.strip("/")
-        if clean_folder and not clean_folder.endswith("/"):
-            clean_folder += "/"
+        clean_folder = normalize_folder(folder)
 
-        log_file_name = clean_folder + "download_log.csv"
+        manifest = DownloadManifest(store, clean_folder)
+        listing_cache = ListingCache(store, clean_folder)
+        index = ChecksumIndex(store, clean_folder) if checksums else None
+        mark = Watermark(store, clean_folder, url, reconcile_hours).load() if watermark else None
+        reconciling = mark is None or mark.reconcile_due
+        keep = None if reconciling else mark.above
 
-        # Step 1: Read log fresh from OneLake (with lock to prevent race conditions)
-        with log_lock:
-            downloaded_files = set()  # Use set for O(1) lookups
+        # Step 1: Get list of .zip files above the watermark, conditionally on the cached listing.
+        # A reconciliation needs the full listing, which the cache may not hold.
+        github_zip_url_map = None
+        cached = {} if mark is not None and reconciling else listing_cache.load(url)
+        with metrics.span(url, "list") as span:
             try:
-                log_result = obstore.get(store, log_file_name)
-                log_bytes = log_result.bytes()
-                log_content = bytes(log_bytes).decode("utf-8").strip()
-                
-                if log_content:
-                    lines = log_content.splitlines()
-                    if len(lines) > 1:  # Skip header if exists
-                        for line in lines[1:]:
-                            if line.strip():
-                                # Extract zip filename (first column)
-                                parts = line.split(",", 1)
-                                if parts:
-                                    downloaded_files.add(parts[0].strip())
+                if is_github_tree_url(url):
+                    # Use GitHub API to list directory contents
+                    api_url = github_tree_to_api_url(url)
+                    api_resp = http.get(api_url, headers=ListingCache.request_headers(cached))
+                    span["retries"] = api_resp.retries
+                    not_modified = api_resp.status_code == 304 and bool(cached)
+                    if not_modified:
+                        pass
+                    elif not api_resp.ok:
+                        span["ok"] = False
+                        return f"{url} - GitHub API error: {api_resp.status_code}", 0
+                    else:
+                        span["bytes_in"] = len(api_resp.content)
+                        items = api_resp.json()
+                        if not isinstance(items, list):
+                            span["ok"] = False
+                            return f"{url} - Not a directory (GitHub API returned file or error)", 0
+                        all_files, github_zip_url_map = parse_github_listing(items)
+                        all_files = [f for f in all_files if keep is None or keep(f)]
+                        cached = ListingCache.entry(url, api_resp.headers, all_files, github_zip_url_map)
+                else:
+                    # Parse the HTML directory listing as it streams in, stopping early where the order allows
+                    with http.get(url, headers=ListingCache.request_headers(cached), stream=True) as listing:
+                        span["retries"] = listing.retries
+                        not_modified = listing.status_code == 304 and bool(cached)
+                        if not not_modified:
+                            listing.raise_for_status()
+                            scanner = ListingScanner(keep)
+                            all_files = []
+                            for block in listing.iter_content(chunk_size=64 * 1024):
+                                span["bytes_in"] += len(block)
+                                all_files.extend(scanner.feed(block))
+                                if scanner.stopped:
+                                    break
+                            all_files.extend(scanner.close())
+                            cached = ListingCache.entry(url, listing.headers, all_files)
             except Exception as e:
-                print(f"Could not read log file {log_file_name}: {e}")
-                downloaded_files = set()
-
-        def extract_week_partition(filename: str) -> str:
-            match = re.search(r"(\d{4})(\d{2})(\d{2})", filename)
-            if match:
-                year, month, day = map(int, match.groups())
-                dt = datetime.date(year, month, day)
-                iso_year, iso_week, _ = dt.isocalendar()
-                return f"week={iso_year}_{iso_week:02d}"
-            return "week=unknown"
-
-        # Step 2: Get list of .zip files based on URL type
-        github_zip_url_map = None
+                span["ok"] = False
+                return f"{url} - Failed to list files: {e}", 0
+
+        if not_modified:
+            if cached["complete"]:
+                return f"{url} - 0 files extracted (listing unchanged since the last run)", 0
+            all_files = [f for f in cached["files"] if keep is None or keep(f)]
+            github_zip_url_map = cached["zip_url_map"]
+
+        # Step 2: Filter out already downloaded files, reading only the manifest partitions they fall in
         try:
-            if is_github_tree_url(url):
-                # Use GitHub API to list directory contents
-                api_url = github_tree_to_api_url(url)
-                api_resp = requests.get(api_url, timeout=30)
-                if not api_resp.ok:
-                    return f"{url} - GitHub API error: {api_resp.status_code}", 0
-                items = api_resp.json()
-                if not isinstance(items, list):
-                    return f"{url} - Not a directory (GitHub API returned file or error)", 0
-
-                zip_files_info = []
-                for item in items:
-                    if item.get("type") == "file" and item.get("name", "").endswith(".zip"):
-                        zip_files_info.append((item["name"], item["download_url"]))
-                
-                zip_files_info.sort(key=lambda x: x[0], reverse=True)
-                all_files = [name for name, _ in zip_files_info]
-                github_zip_url_map = dict(zip_files_info)
-            else:
-                # Original: parse HTML directory listing
-                html_content = urlopen(url).read().decode("utf-8")
-                pattern = re.compile(r"[\w.-]+\.zip")
-                all_files = sorted(dict.fromkeys(pattern.findall(html_content)), reverse=True)
+            with metrics.span(url, "manifest_read"):
+                downloaded_files = manifest.downloaded(all_files)
         except Exception as e:
-            return f"{url} - Failed to list files: {e}", 0
-
-        # Filter out already downloaded files
-        new_files = [f for f in all_files if f not in downloaded_files]
-        new_files = sorted(new_files, reverse=True)[:totalfiles]
+            print(f"Could not read manifest {manifest.root}: {e}")
+            downloaded_files = set()
+        pending_files = [f for f in all_files if f not in downloaded_files]
+        new_files = sorted(pending_files, reverse=True)[:totalfiles]
 
         if not new_files:
+            listing_cache.save(cached, complete=True)
+            if mark is not None:
+                mark.advance(all_files, downloaded_files, reconciling)
+            if keep is not None and not all_files:
+                return f"{url} - 0 files extracted (no new files above the watermark)", 0
             return f"{url} - 0 files extracted (all {len(all_files)} files already downloaded)", 0
 
-        uploaded_log_entries = []
-        batch_uploads = []
+        successful_uploads = []
+        results_lock = threading.Lock()
+        skipped = 0
+        not_started = 0  # files left for the next run by the time budget
+
+        committed = set()  # files whose entries a batch commit already wrote to the manifest
+        finished = []
+        commit_lock = threading.Lock()
+
+        def commit(entries: list) -> None:
+            with commit_lock:
+                try:
+                    if index is not None:
+                        index.flush()  # before the manifest, so a crash in between is recoverable
+                    with metrics.span(url, "manifest_write"):
+                        manifest.append(entries)
+                except Exception as e:
+                    print(f"Error updating manifest {manifest.root}: {e}")
+                    return
+            with results_lock:
+                committed.update(entry[0] for entry in entries)
 
-        def process_file(filename: str):
+        def file_done(filename: str) -> None:
+            """All uploads of `filename` are done; commit the manifest once commit_every files are waiting."""
+            if not commit_every or bundle_bytes > 0:
+                return
+            with results_lock:
+                finished.append(filename)
+                if len(finished) < commit_every:
+                    return
+                batch = set(finished)
+                finished.clear()
+                entries = [entry for entry in successful_uploads if entry[0] in batch]
+            if entries:
+                commit(entries)
+
+        def admitted() -> bool:
+            nonlocal not_started
+            if budget.admit():
+                return True
+            with results_lock:
+                not_started += 1
+            return False
+
+        # Files a crashed run already uploaded only need their manifest entries
+        if index is not None:
             try:
-                # Determine download URL
-                if is_github_tree_url(url):
-                    download_url = github_zip_url_map[filename]
-                else:
-                    download_url = url + filename
-
-                with requests.get(download_url, stream=True, timeout=30) as resp:
-                    if not resp.ok:
-                        print(f"Failed to download {filename}: HTTP {resp.status_code}")
-                        return None
-                    zip_bytes = io.BytesIO(resp.content)
-                    with zipfile.ZipFile(zip_bytes, "r") as zf:
-                        results = []
-                        for zip_info in zf.infolist():
-                            if zip_info.is_dir():
-                                continue
-                            with zf.open(zip_info) as extracted:
-                                gzip_buffer = io.BytesIO()
-                                with gzip.GzipFile(filename=zip_info.filename, mode="wb", fileobj=gzip_buffer) as gz:
-                                    gz.write(extracted.read())
-                                gz_name = zip_info.filename + ".gz"
-                                partition_folder = clean_folder + extract_week_partition(filename) + "/"
-                                gz_filename = partition_folder + gz_name
-                                results.append((filename, gz_filename, gzip_buffer.getvalue()))
-                        return results
+                with metrics.span(url, "recover"):
+                    recovered = index.recover(new_files)
             except Exception as e:
-                print(f"Error processing {filename}: {e}")
-                return None
+                print(f"Could not read checksum index {index.root}: {e}")
+                recovered = []
+            successful_uploads.extend(recovered)
+            recovered_files = {entry[0] for entry in recovered}
+            new_files = [f for f in new_files if f not in recovered_files]
 
-        # Step 3: Parallelize file-level downloads
-        with ThreadPoolExecutor(max_workers=min(8, len(new_files))) as pool:
-            futures = [pool.submit(process_file, fn) for fn in new_files]
-            for f in as_completed(futures):
-                res = f.result()
-                if res:
-                    for zipf, gzf, data in res:
-                        uploaded_log_entries.append((zipf, gzf))
-                        batch_uploads.append((gzf, data))
-
-        if not batch_uploads:
-            return f"{url} - No files to upload", 0
+        def cached_archive(filename: str, entry: dict):
+            """Open a cached archive positioned at its end, like a finished spool; None if it is gone."""
+            spool = cache.open(entry)
+            if spool is not None:
+                spool.seek(0, os.SEEK_END)
+                metrics.record(url, "archive_cache", 0.0, filename, bytes_in=entry["size"])
+            return spool
 
-        # Step 4: Parallelize uploads
-        successful_uploads = []
-        with ThreadPoolExecutor(max_workers=min(8, len(batch_uploads))) as pool:
-            futures = {
-                pool.submit(obstore.put, store, gz_filename, data): (gz_filename, orig_filename)
-                for (gz_filename, data), (orig_filename, _) in zip(batch_uploads, uploaded_log_entries)
-            }
-            for future in as_completed(futures):
-                gz_filename, orig_filename = futures[future]
+        def fetch_archive(filename: str, use_cache: bool = True):
+            """Download one archive in chunk_size reads; small ones stay in memory, larger ones spill to disk."""
+            if is_github_tree_url(url):
+                download_url = github_zip_url_map[filename]
+            else:
+                download_url = url + filename
+
+            entry = cache.lookup(download_url) if cache is not None and use_cache else None
+            if entry is not None and not cache.revalidate:
+                spool = cached_archive(filename, entry)
+                if spool is not None:
+                    return spool
+                entry = None
+
+            with download_limit.slot() as outcome, metrics.span(url, "download", filename) as span, \
+                    http.get(download_url, stream=True, headers=ArchiveCache.request_headers(entry)) as resp:
+                span["retries"], span["concurrency"] = resp.retries, outcome["limit"]
+                outcome["throttled"] = resp.retries > 0 or resp.status_code in RETRY_STATUSES
+                if ArchiveCache.current(entry, resp.status_code, resp.headers):
+                    spool = cached_archive(filename, entry)
+                    if spool is not None:
+                        return spool
+                elif not resp.ok:
+                    span["ok"] = False
+                    print(f"Failed to download {filename}: HTTP {resp.status_code}")
+                    return None
+                else:
+                    spool = tempfile.SpooledTemporaryFile(max_size=chunk_size)
+                    try:
+                        for block in resp.iter_content(chunk_size=chunk_size):
+                            spool.write(block)
+                    except Exception:
+                        spool.close()
+                        raise
+                    if cache is not None:
+                        try:
+                            cache.add(download_url, resp.headers, spool)
+                        except Exception as e:
+                            print(f"Could not cache {filename}: {e}")
+                    span["bytes_in"] = outcome["bytes"] = spool.tell()
+                    return spool
+            # Still current, but evicted between the lookup and the open
+            return fetch_archive(filename, use_cache=False)
+
+        def stream_archive(filename: str, spool) -> List[Tuple[str, str]]:
+            """Gzip every member chunk by chunk straight into a multipart upload."""
+            spool.seek(0)
+            uploaded = []
+            with zipfile.ZipFile(spool, "r") as zf:
+                for zip_info, gz_filename in member_targets(clean_folder, filename, zf, extension):
+                    # open_writer switches to a multipart upload once buffer_size is exceeded,
+                    # and aborts the upload if anything below raises
+                    digest = hashlib.md5()
+                    with zf.open(zip_info) as extracted, \
+                            store.open_writer(gz_filename, buffer_size=chunk_size) as writer:
+                        compress_stream(HashingReader(extracted, digest), writer, zip_info.filename, chunk_size,
+                                        codec, level)
+                    if index is not None:
+                        index.record(filename, gz_filename, digest.hexdigest(), None)
+                    uploaded.append((filename, gz_filename))
+            if index is not None:
+                index.expect(filename, len(uploaded))
+            return uploaded
+
+        # Recompression stays CPU bound; downloads and uploads go to the pools shared by every URL
+        n_recompress = max(1, min(8, len(new_files)))
+
+        if streaming:
+            # Step 3+4: each worker carries one file end to end, so memory stays O(chunk_size) per file
+            def process_file_streaming(filename: str):
+                if not admitted():
+                    return []
+                started = time.perf_counter()
                 try:
-                    future.result()
-                    successful_uploads.append((orig_filename, gz_filename))
+                    spool = fetch_archive(filename)
+                    if spool is None:
+                        return []
+                    # One span: members are compressed straight into their multipart uploads
+                    with spool, metrics.span(url, "recompress_upload", filename) as span:
+                        span["bytes_in"] = spool.tell()
+                        if not parquet:
+                            return stream_archive(filename, spool)
+                        uploaded = []
+                        for path, data, checksum in transform_archive(clean_folder, filename, spool):
+                            if path is not None and (index is None or not index.unchanged(path, filename, checksum)):
+                                store.put(path, data)
+                                span["bytes_out"] += len(data)
+                            if index is not None:
+                                index.record(filename, path or "", checksum, len(data or b""))
+                            uploaded.append((filename, path or ""))
+                        if index is not None:
+                            index.expect(filename, len(uploaded))
+                        return uploaded
                 except Exception as e:
-                    print(f"Error uploading {gz_filename}: {e}")
+                    print(f"Error processing {filename}: {e}")
+                    return []
+                finally:
+                    budget.record(time.perf_counter() - started)
 
-        # Step 5: Update log with only successful uploads
-        if successful_uploads:
-            with log_lock:
+            files = {fetch_pool.submit(process_file_streaming, fn): fn for fn in new_files}
+            for f in as_completed(files):
+                uploaded = f.result()
+                with results_lock:
+                    successful_uploads.extend(uploaded)
+                if uploaded:
+                    file_done(files[f])
+        else:
+            # Step 3+4: fetch -> recompress -> upload pipeline. Each file moves to the next stage as
+            # soon as it is ready; the archive queue and the member budget cap how much data is in flight.
+            archives = ByteBoundedQueue(max_inflight_bytes // 2)
+            members = ByteBudget(max_inflight_bytes // 2)
+            member_uploads = []
+
+            def fetch_stage(filename: str):
+                if not admitted():
+                    return
+                started = time.perf_counter()
                 try:
-                    # Read current log state again (in case it was updated by another thread)
-                    existing_lines = []
+                    spool = fetch_archive(filename)
+                except Exception as e:
+                    print(f"Error downloading {filename}: {e}")
+                    spool = None
+                if spool is None:
+                    budget.record(time.perf_counter() - started)
+                else:
+                    archives.put((filename, spool, time.perf_counter(), started), spool.tell())
+
+            def when_uploaded(filename: str, started: float, uploads: list) -> None:
+                """Once the last member upload of a file is done: time it for the budget, and file_done()."""
+                if not uploads:
+                    budget.record(time.perf_counter() - started)
+                    return
+                left = [len(uploads)]
+
+                def uploaded(_):
+                    with results_lock:
+                        left[0] -= 1
+                        last = left[0] == 0
+                    if last:
+                        budget.record(time.perf_counter() - started)
+                        file_done(filename)
+                for future in uploads:
+                    future.add_done_callback(uploaded)
+
+            def recompress_stage():
+                while (item := archives.get()) is not None:
+                    filename, spool, queued, started = item
+                    file_uploads = []
+                    # Queue waits include any time the producer was held back by the byte bound
+                    metrics.record(url, "recompress_queue", time.perf_counter() - queued, filename)
+                    start, blocked, size, out = time.perf_counter(), 0.0, spool.tell(), 0
                     try:
-                        existing_log_result = obstore.get(store, log_file_name)
-                        existing_log_bytes = existing_log_result.bytes()
-                        existing_log = bytes(existing_log_bytes).decode("utf-8").strip()
-                        if existing_log:
-                            lines = existing_log.splitlines()
-                            if len(lines) > 1:  # Skip header
-                                existing_lines = lines[1:]
-                    except:
-                        pass
+                        # Every member before any is queued: a member failing to extract fails the whole
+                        # archive, which then stays out of the manifest and is fetched again next run
+                        if parquet:
+                            recompressed = list(transform_archive(clean_folder, filename, spool))
+                        elif processes is None:
+                            recompressed = list(recompress_archive(clean_folder, filename, spool, chunk_size,
+                                                                   codec, level))
+                        else:
+                            spool.seek(0)
+                            recompressed = processes.submit(recompress_archive_bytes, clean_folder, filename,
+                                                            spool.read(), chunk_size, codec, level).result()
+                        count = 0
+                        for gz_filename, data, checksum in recompressed:
+                            nbytes = len(data) if data is not None else 0
+                            queued = time.perf_counter()
+                            held = members.acquire(nbytes)
+                            blocked += time.perf_counter() - queued
+                            future = upload_pool.submit(upload_member, filename, gz_filename, data, checksum,
+                                                        time.perf_counter(), held)
+                            file_uploads.append(future)
+                            with results_lock:
+                                member_uploads.append(future)
+                            out += nbytes
+                            count += 1
+                        if index is not None:
+                            index.expect(filename, count)
+                    except Exception as e:
+                        print(f"Error processing {filename}: {e}")
+                        metrics.record(url, "recompress", time.perf_counter() - start - blocked, filename,
+                                       bytes_in=size, bytes_out=out, ok=False)
+                    else:
+                        metrics.record(url, "recompress", time.perf_counter() - start - blocked, filename,
+                                       bytes_in=size, bytes_out=out)
+                    finally:
+                        spool.close()
+                        when_uploaded(filename, started, file_uploads)
 
-                    # Add new entries
-                    new_lines = [f"{zipf},{gzf}" for zipf, gzf in successful_uploads]
-                    all_log_lines = existing_lines + new_lines
-                    log_content = "zip_filename,extracted_filepath\n" + "\n".join(all_log_lines)
-                    obstore.put(store, log_file_name, log_content.encode("utf-8"))
-                    print(f"Updated log {log_file_name} with {len(successful_uploads)} new entries")
+            bundler = Bundler(bundle_bytes, extension) if bundle_bytes > 0 and not parquet else None
 
+            def upload(path: str, data: bytes, entries: list, checksum: str = None) -> None:
+                nonlocal skipped
+                if path is None:  # an archive without any wanted record type
+                    if index is not None:
+                        index.record(entries[0][0], "")
+                    with results_lock:
+                        successful_uploads.extend(entries)
+                    return
+                # A bundle's span is keyed by the bundle, the files in it are in the manifest
+                file = entries[0][0] if len(entries) == 1 else path
+                try:
+                    if index is not None and index.unchanged(path, file, checksum):
+                        metrics.record(url, "upload_skipped", 0.0, file)
+                        with results_lock:
+                            skipped += 1
+                    else:
+                        with upload_limit.slot() as outcome, metrics.span(url, "upload", file) as span:
+                            span["bytes_out"] = outcome["bytes"] = len(data)
+                            span["concurrency"] = outcome["limit"]
+                            store.put(path, data)
+                    if index is not None:
+                        for entry in entries:
+                            index.record(entry[0], path, checksum, len(data), *entry[2:])
+                    with results_lock:
+                        successful_uploads.extend(entries)
                 except Exception as e:
-                    print(f"Error updating log file {log_file_name}: {e}")
+                    print(f"Error uploading {path}: {e}")
 
-        return f"{url} - {len(successful_uploads)} files extracted and uploaded", len(successful_uploads)
+            def upload_member(orig_filename: str, gz_filename: str, data: bytes, checksum: str, queued: float,
+                              held: int) -> None:
+                try:
+                    metrics.record(url, "upload_queue", time.perf_counter() - queued, orig_filename)
+                    if bundler is None:
+                        upload(gz_filename, data, [(orig_filename, gz_filename or "")], checksum)
+                    elif (bundle := bundler.add(orig_filename, gz_filename, data)) is not None:
+                        upload(*bundle)
+                finally:
+                    members.release(held)
+
+            with ThreadPoolExecutor(max_workers=n_recompress) as recompress_threads:
+                recompressors = [recompress_threads.submit(recompress_stage) for _ in range(n_recompress)]
+                wait([fetch_pool.submit(fetch_stage, fn) for fn in new_files])
+                # Drain stage by stage: one sentinel per recompressor, then this URL's uploads
+                for _ in recompressors:
+                    archives.put(None, 0)
+                wait(recompressors)
+            wait(member_uploads)
+            if bundler is not None:
+                wait([upload_pool.submit(upload, *bundle) for bundle in bundler.flush()])
+
+        if index is not None:
+            index.flush()  # before the manifest, so a crash in between is recoverable
+
+        if not successful_uploads:
+            if not_started:
+                return f"{url} - skipped, out of time budget ({not_started} files left)", 0
+            return f"{url} - No files to upload", 0
+
+        # Step 5: Append the successful uploads not committed in a batch yet to the manifest
+        commit([entry for entry in successful_uploads if entry[0] not in committed])
+        ingested = {entry[0] for entry in successful_uploads} & committed
+        if ingested:
+            print(f"Updated manifest {manifest.root} with "
+                  f"{sum(entry[0] in ingested for entry in successful_uploads)} new entries")
+        try:
+            # The cached listing is complete once nothing it lists is left to ingest
+            listing_cache.save(cached, complete=all(f in ingested for f in pending_files))
+            if mark is not None:
+                mark.advance(all_files, downloaded_files | ingested, reconciling)
+        except Exception as e:
+            print(f"Error updating manifest {manifest.root}: {e}")
+
+        notes = []
+        if index is not None and recovered:
+            notes.append(f"{len(recovered_files)} recovered from the checksum index")
+        if skipped:
+            notes.append(f"{skipped} unchanged uploads skipped")
+        if not_started:
+            notes.append(f"stopped for the time budget, {not_started} files left")
+        notes = f" ({', '.join(notes)})" if notes else ""
+        return f"{url} - {len(successful_uploads)} files extracted and uploaded{notes}", len(successful_uploads)
+
+    # Shared by every URL; streaming mode keeps recompression in its own threads
+    processes = None if streaming or parquet else recompress_pool(recompress_workers)
+    # One download and one upload pool for every URL, as large as their limiters can go
+    fetch_pool = ThreadPoolExecutor(max_workers=download_limit.ceiling)
+    upload_pool = ThreadPoolExecutor(max_workers=upload_limit.ceiling)
 
     # Process URLs concurrently
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_url = {
-            executor.submit(process_url, (url, folder)): url
-            for url, folder in zip(urls, folders)
-        }
-        for future in as_completed(future_to_url):
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            future_to_url = {
+                executor.submit(process_url, (url, folder)): url
+                for url, folder in zip(urls, folders)
+            }
+            for future in as_completed(future_to_url):
+                try:
+                    result, files_count = future.result()
+                    summary.append(result)
+                    total_files_processed += files_count
+                except Exception as e:
+                    url = future_to_url[future]
+                    summary.append(f"{url} - Error: {e}")
+                    # Don't add to total_files_processed for errors
+    finally:
+        fetch_pool.shutdown()
+        upload_pool.shutdown()
+        if own_http:
+            http.close()
+        if processes is not None:
+            processes.shutdown()
+
+    # Print summary for debugging
+    metrics.finish(total_files_processed, http.stats(),
+                   {"download": download_limit.stats(), "upload": upload_limit.stats()})
+    summary.append(f"HTTP: {metrics.http}")
+    if cache is not None:
+        cache.save()
+        summary.append(f"Archive cache: {cache.stats()}")
+    summary.append(metrics.summary_line())
+    print("\n".join(summary))
+    emit(metrics, metrics_sink)
+
+    # 1 if any files were processed, 0 otherwise
+    return ScrapeResult(1 if total_files_processed > 0 else 0, metrics)
+
+
+async def scraping_async(urls: List[str], folders: List[str], totalfiles: int, ws: str, lh: str,
+                         max_concurrency: int = 32, per_host_limit: int = 8,
+                         chunk_size: int = 8 * 1024 * 1024, store=None, codec: str = "gzip", level: int = None,
+                         recompress_workers: int = None, watermark: bool = True, reconcile_hours: float = 24,
+                         bundle_bytes: int = 0, output_format: str = "csv", metrics_sink=None,
+                         checksums: bool = True, archive_cache=None) -> int:
+    """
+    asyncio counterpart of scraping(): one event loop drives every URL and file.
+
+    Requests share a global limit (max_concurrency) and a per-host limit
+    (per_host_limit, keyed by host, with the object store counted as one host)
+    instead of nested thread pools. Listing and downloads go through aiohttp,
+    uploads through the store's put_async (obstore's own for obstore
+    stores, a worker thread for other backends); only the
+    zip -> gzip/zstd recompression leaves the loop, to worker threads or,
+    with `recompress_workers`, the same process pool as scraping() (`codec`,
+    `level`). `watermark`, `reconcile_hours`,
+    `bundle_bytes`, `output_format`, `metrics_sink`, `checksums` and
+    `archive_cache` work as in scraping();
+    the download_queue span is the time a download waited for its limits.
+
+    In a notebook: `await scraping_async(urls, folders, 60, ws, lh)`.
+
+    Returns:
+        ScrapeResult: an int, 1 if files were successfully downloaded, 0 if
+        error or no new files, with the run's RunMetrics on `.metrics`
+    """
+    import aiohttp
+
+    level = codec_level(codec, level)
+    if output_format not in ("csv", "parquet"):
+        raise ValueError(f"Unknown output_format '{output_format}', use 'csv' or 'parquet'")
+    parquet = output_format == "parquet"
+    if store is None:
+        from obstore.store import from_url
+        store = from_url(f'abfss://{ws}@onelake.dfs.fabric.microsoft.com/{lh}.Lakehouse/Files')
+    store = as_backend(store)
+    summary = []
+    total_files_processed = 0
+    metrics = RunMetrics("async")
+    cache = ArchiveCache(archive_cache) if isinstance(archive_cache, str) else archive_cache
+    retries = 0
+
+    global_limit = asyncio.Semaphore(max_concurrency)
+    host_limits = {}
+
+    @contextlib.asynccontextmanager
+    async def limited(host: str):
+        if host not in host_limits:
+            host_limits[host] = asyncio.Semaphore(per_host_limit)
+        # Host first, so a request waiting on a busy host does not hold a global slot
+        async with host_limits[host], global_limit:
+            yield
+
+    def cached_archive(url: str, filename: str, entry: dict):
+        spool = cache.open(entry)
+        if spool is not None:
+            spool.seek(0, os.SEEK_END)
+            metrics.record(url, "archive_cache", 0.0, filename, bytes_in=entry["size"])
+        return spool
+
+    async def fetch_archive(session, url: str, filename: str, download_url: str, max_retries: int = 4,
+                            use_cache: bool = True):
+        # Same retry policy as HttpTransport: backoff with jitter on connection errors and 429/5xx
+        nonlocal retries
+        entry = cache.lookup(download_url) if cache is not None and use_cache else None
+        if entry is not None and not cache.revalidate:
+            spool = await asyncio.to_thread(cached_archive, url, filename, entry)
+            if spool is not None:
+                return spool
+            entry = None
+        waited = 0.0
+        with metrics.span(url, "download", filename) as span:
             try:
-                result, files_count = future.result()
-                summary.append(result)
-                total_files_processed += files_count
+                for attempt in range(max_retries + 1):
+                    span["retries"] = attempt
+                    try:
+                        queued = time.perf_counter()
+                        async with limited(urlparse(download_url).netloc):
+                            waited += time.perf_counter() - queued
+                            async with session.get(download_url, headers=ArchiveCache.request_headers(entry)) as resp:
+                                if ArchiveCache.current(entry, resp.status, resp.headers):
+                                    spool = await asyncio.to_thread(cached_archive, url, filename, entry)
+                                    if spool is not None:
+                                        return spool
+                                    break  # evicted between the lookup and the open
+                                if resp.status in RETRY_STATUSES and attempt < max_retries:
+                                    retry_after = resp.headers.get("Retry-After", "")
+                                    delay = max(backoff_delay(attempt),
+                                                float(retry_after) if retry_after.isdigit() else 0)
+                                elif resp.status != 200:
+                                    span["ok"] = False
+                                    print(f"Failed to download {filename}: HTTP {resp.status}")
+                                    return None
+                                else:
+                                    spool = tempfile.SpooledTemporaryFile(max_size=chunk_size)
+                                    async for block in resp.content.iter_chunked(chunk_size):
+                                        spool.write(block)
+                                    if cache is not None:
+                                        try:
+                                            await asyncio.to_thread(cache.add, download_url, resp.headers, spool)
+                                        except Exception as e:
+                                            print(f"Could not cache {filename}: {e}")
+                                    span["bytes_in"] = spool.tell()
+                                    return spool
+                    except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                        if attempt >= max_retries:
+                            raise
+                        delay = backoff_delay(attempt)
+                    # Sleep outside the limits so a backing-off request holds no slot
+                    retries += 1
+                    await asyncio.sleep(delay)
+            finally:
+                metrics.record(url, "download_queue", waited, filename)
+        return await fetch_archive(session, url, filename, download_url, max_retries, use_cache=False)
+
+    async def upload(url: str, index, path: str, data: bytes, entries: list, checksum: str = None) -> list:
+        file = entries[0][0] if len(entries) == 1 else path
+        if index is not None and await asyncio.to_thread(index.unchanged, path, file, checksum):
+            metrics.record(url, "upload_skipped", 0.0, file)
+        else:
+            with metrics.span(url, "upload", file) as span:
+                span["bytes_out"] = len(data)
+                async with limited("store"):
+                    await store.put_async(path, data)
+        if index is not None:
+            for entry in entries:
+                await asyncio.to_thread(index.record, entry[0], path, checksum, len(data), *entry[2:])
+        return entries
+
+    async def process_file(session, url: str, clean_folder: str, filename: str, download_url: str, index,
+                           bundler=None):
+        """Returns the manifest entries uploaded, including other files' members in a bundle this file sealed."""
+        try:
+            spool = await fetch_archive(session, url, filename, download_url)
+            if spool is None:
+                return []
+            with spool, metrics.span(url, "recompress", filename) as span:
+                span["bytes_in"] = spool.tell()
+                if parquet:
+                    members = await asyncio.to_thread(lambda: list(transform_archive(clean_folder, filename, spool)))
+                else:
+                    spool.seek(0)
+                    members = await asyncio.get_running_loop().run_in_executor(
+                        processes, recompress_archive_bytes, clean_folder, filename, spool.read(), chunk_size,
+                        codec, level)
+                span["bytes_out"] = sum(len(data) for _, data, _ in members if data is not None)
+            if index is not None:
+                await asyncio.to_thread(index.expect, filename, len(members))
+            uploaded = []
+            for gz_filename, data, checksum in members:
+                if gz_filename is None:  # an archive without any wanted record type
+                    if index is not None:
+                        await asyncio.to_thread(index.record, filename, "")
+                    uploaded.append((filename, ""))
+                elif bundler is None:
+                    uploaded += await upload(url, index, gz_filename, data, [(filename, gz_filename)], checksum)
+                elif (bundle := bundler.add(filename, gz_filename, data)) is not None:
+                    uploaded += await upload(url, index, *bundle)
+            return uploaded
+        except Exception as e:
+            print(f"Error processing {filename}: {e}")
+            return []
+
+    async def process_url(session, url: str, folder: str) -> Tuple[str, int]:
+        clean_folder = normalize_folder(folder)
+        manifest = DownloadManifest(store, clean_folder)
+        listing_cache = ListingCache(store, clean_folder)
+        index = ChecksumIndex(store, clean_folder) if checksums else None
+        mark = await asyncio.to_thread(Watermark(store, clean_folder, url, reconcile_hours).load) if watermark else None
+        reconciling = mark is None or mark.reconcile_due
+        keep = None if reconciling else mark.above
+
+        # Step 1: List .zip files above the watermark, conditionally on the cached listing
+        github_zip_url_map = None
+        cached = {} if mark is not None and reconciling else await asyncio.to_thread(listing_cache.load, url)
+        conditional = ListingCache.request_headers(cached)
+        with metrics.span(url, "list") as span:
+            try:
+                if is_github_tree_url(url):
+                    api_url = github_tree_to_api_url(url)
+                    async with limited(urlparse(api_url).netloc):
+                        async with session.get(api_url, headers=conditional) as api_resp:
+                            not_modified = api_resp.status == 304 and bool(cached)
+                            if not_modified:
+                                pass
+                            elif api_resp.status != 200:
+                                span["ok"] = False
+                                return f"{url} - GitHub API error: {api_resp.status}", 0
+                            else:
+                                items = await api_resp.json(content_type=None)
+                                span["bytes_in"] = api_resp.content.total_bytes
+                                if not isinstance(items, list):
+                                    span["ok"] = False
+                                    return f"{url} - Not a directory (GitHub API returned file or error)", 0
+                                all_files, github_zip_url_map = parse_github_listing(items)
+                                all_files = [f for f in all_files if keep is None or keep(f)]
+                                cached = ListingCache.entry(url, api_resp.headers, all_files, github_zip_url_map)
+                else:
+                    async with limited(urlparse(url).netloc):
+                        async with session.get(url, headers=conditional) as listing:
+                            not_modified = listing.status == 304 and bool(cached)
+                            if not not_modified:
+                                listing.raise_for_status()
+                                scanner = ListingScanner(keep)
+                                all_files = []
+                                async for block in listing.content.iter_chunked(64 * 1024):
+                                    span["bytes_in"] += len(block)
+                                    all_files.extend(scanner.feed(block))
+                                    if scanner.stopped:
+                                        break
+                                all_files.extend(scanner.close())
+                                cached = ListingCache.entry(url, listing.headers, all_files)
             except Exception as e:
-                url = future_to_url[future]
-                summary.append(f"{url} - Error: {e}")
-                # Don't add to total_files_processed for errors
+                span["ok"] = False
+                return f"{url} - Failed to list files: {e}", 0
 
-    # Print summary for debugging
+        if not_modified:
+            if cached["complete"]:
+                return f"{url} - 0 files extracted (listing unchanged since the last run)", 0
+            all_files = [f for f in cached["files"] if keep is None or keep(f)]
+            github_zip_url_map = cached["zip_url_map"]
+
+        # Step 2: Filter out already downloaded files (manifest I/O is small and runs off the loop)
+        try:
+            with metrics.span(url, "manifest_read"):
+                downloaded_files = await asyncio.to_thread(manifest.downloaded, all_files)
+        except Exception as e:
+            print(f"Could not read manifest {manifest.root}: {e}")
+            downloaded_files = set()
+        pending_files = [f for f in all_files if f not in downloaded_files]
+        new_files = sorted(pending_files, reverse=True)[:totalfiles]
+        if not new_files:
+            await asyncio.to_thread(listing_cache.save, cached, True)
+            if mark is not None:
+                await asyncio.to_thread(mark.advance, all_files, downloaded_files, reconciling)
+            if keep is not None and not all_files:
+                return f"{url} - 0 files extracted (no new files above the watermark)", 0
+            return f"{url} - 0 files extracted (all {len(all_files)} files already downloaded)", 0
+
+        # Files a crashed run already uploaded only need their manifest entries
+        recovered = []
+        if index is not None:
+            try:
+                with metrics.span(url, "recover"):
+                    recovered = await asyncio.to_thread(index.recover, new_files)
+            except Exception as e:
+                print(f"Could not read checksum index {index.root}: {e}")
+            recovered_files = {entry[0] for entry in recovered}
+            new_files = [f for f in new_files if f not in recovered_files]
+
+        # Step 3+4: every file of every URL is scheduled on the same loop
+        bundler = Bundler(bundle_bytes, CODECS[codec][0]) if bundle_bytes > 0 and not parquet else None
+        results = await asyncio.gather(*(
+            process_file(session, url, clean_folder, fn,
+                         github_zip_url_map[fn] if github_zip_url_map is not None else url + fn, index, bundler)
+            for fn in new_files
+        ))
+        results.append(recovered)
+        if bundler is not None:
+            bundles = bundler.flush()
+            outcomes = await asyncio.gather(*(upload(url, index, *bundle) for bundle in bundles),
+                                            return_exceptions=True)
+            for (path, _, _), outcome in zip(bundles, outcomes):
+                if isinstance(outcome, BaseException):
+                    print(f"Error uploading {path}: {outcome}")
+                else:
+                    results.append(outcome)
+        successful_uploads = [entry for uploaded in results for entry in uploaded]
+        if index is not None:
+            await asyncio.to_thread(index.flush)  # before the manifest, so a crash in between is recoverable
+        if not successful_uploads:
+            return f"{url} - No files to upload", 0
+
+        # Step 5: Append only the successful uploads to the manifest
+        try:
+            with metrics.span(url, "manifest_write"):
+                await asyncio.to_thread(manifest.append, successful_uploads)
+            print(f"Updated manifest {manifest.root} with {len(successful_uploads)} new entries")
+            ingested = {entry[0] for entry in successful_uploads}
+            await asyncio.to_thread(listing_cache.save, cached, all(f in ingested for f in pending_files))
+            if mark is not None:
+                await asyncio.to_thread(mark.advance, all_files, downloaded_files | ingested, reconciling)
+        except Exception as e:
+            print(f"Error updating manifest {manifest.root}: {e}")
+
+        return f"{url} - {len(successful_uploads)} files extracted and uploaded", len(successful_uploads)
+
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=30)
+    connector = aiohttp.TCPConnector(limit=max_concurrency, limit_per_host=per_host_limit)
+    # None falls back to the loop's default thread pool
+    processes = None if parquet else recompress_pool(recompress_workers)
+    try:
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            outcomes = await asyncio.gather(*(process_url(session, url, folder) for url, folder in zip(urls, folders)),
+                                            return_exceptions=True)
+    finally:
+        if processes is not None:
+            processes.shutdown()
+
+    for url, outcome in zip(urls, outcomes):
+        if isinstance(outcome, BaseException):
+            summary.append(f"{url} - Error: {outcome}")
+            continue
+        result, files_count = outcome
+        summary.append(result)
+        total_files_processed += files_count
+
+    metrics.finish(total_files_processed, {"client": "aiohttp", "retries": retries})
+    if cache is not None:
+        cache.save()
+        summary.append(f"Archive cache: {cache.stats()}")
+    summary.append(metrics.summary_line())
     print("\n".join(summary))
-    
-    # Return 1 if any files were processed, 0 otherwise
-    return 1 if total_files_processed > 0 else 0
+    emit(metrics, metrics_sink)
+    return ScrapeResult(1 if total_files_processed > 0 else 0, metrics)
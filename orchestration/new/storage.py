@@ -0,0 +1,264 @@
+import asyncio
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+try:
+    # The same class obstore raises, so ObstoreBackend needs no translation
+    from obstore.exceptions import AlreadyExistsError
+except ImportError:
+    class AlreadyExistsError(Exception):
+        """put(mode="create") of a path that already exists."""
+
+
+class StorageBackend:
+    """
+    What the ingestion engine needs from the Lakehouse Files area, so the
+    same code runs on obstore, the Fabric lakehouse file client (UDFs) and
+    a local directory.
+
+    Paths are relative, "/"-separated object keys. A missing object is
+    FileNotFoundError from get/head (and may be from delete); put with
+    mode="create" is the conditional put the manifest commits rely on: it
+    either creates the object or raises AlreadyExistsError, atomically, and
+    leaves the existing object alone. open_writer is a context manager
+    taking write(bytes) calls, uploaded in parts of about buffer_size, and
+    leaves nothing behind if the block raises. list yields {"path", "size"}
+    for every object under a "/"-terminated prefix, at any depth.
+
+    Implementations must be safe to call from many threads at once.
+    """
+
+    def get(self, path: str) -> bytes:
+        raise NotImplementedError
+
+    def put(self, path: str, data: bytes, mode: str = "overwrite") -> None:
+        raise NotImplementedError
+
+    def head(self, path: str) -> dict:
+        raise NotImplementedError
+
+    def list(self, prefix: str) -> Iterator[dict]:
+        raise NotImplementedError
+
+    def delete(self, path: str) -> None:
+        raise NotImplementedError
+
+    def open_writer(self, path: str, buffer_size: int = 8 * 1024 * 1024):
+        raise NotImplementedError
+
+    async def put_async(self, path: str, data: bytes, mode: str = "overwrite") -> None:
+        await asyncio.to_thread(self.put, path, data, mode)
+
+
+class ObstoreBackend(StorageBackend):
+    """An obstore store (OneLake via from_url, S3, LocalStore, MemoryStore...)."""
+
+    def __init__(self, store):
+        import obstore
+        self.obstore = obstore
+        self.store = store
+
+    def get(self, path: str) -> bytes:
+        return bytes(self.obstore.get(self.store, path).bytes())
+
+    def put(self, path: str, data: bytes, mode: str = "overwrite") -> None:
+        self.obstore.put(self.store, path, data, mode=mode)
+
+    def head(self, path: str) -> dict:
+        meta = self.obstore.head(self.store, path)
+        return {"path": meta["path"], "size": meta["size"]}
+
+    def list(self, prefix: str) -> Iterator[dict]:
+        for batch in self.obstore.list(self.store, prefix=prefix):
+            for meta in batch:
+                yield {"path": meta["path"], "size": meta["size"]}
+
+    def delete(self, path: str) -> None:
+        self.obstore.delete(self.store, path)
+
+    def open_writer(self, path: str, buffer_size: int = 8 * 1024 * 1024):
+        return self.obstore.open_writer(self.store, path, buffer_size=buffer_size)
+
+    async def put_async(self, path: str, data: bytes, mode: str = "overwrite") -> None:
+        await self.obstore.put_async(self.store, path, data, mode=mode)
+
+
+class FabricFilesBackend(StorageBackend):
+    """
+    The Files area behind a Fabric lakehouse connection, as UDFs get it from
+    FabricLakehouseClient.connectToFiles() (an Azure Data Lake file system
+    client). Multipart uploads are create_file/append_data/flush_data;
+    conditional puts are upload_data(overwrite=False).
+    """
+
+    def __init__(self, connection):
+        from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
+        self.connection = connection
+        self.exists_error = ResourceExistsError
+        self.not_found_error = ResourceNotFoundError
+
+    @contextmanager
+    def _file(self, path: str):
+        client = self.connection.get_file_client(path)
+        try:
+            yield client
+        except self.not_found_error as e:
+            raise FileNotFoundError(path) from e
+        finally:
+            client.close()
+
+    def get(self, path: str) -> bytes:
+        with self._file(path) as client:
+            return client.download_file().readall()
+
+    def put(self, path: str, data: bytes, mode: str = "overwrite") -> None:
+        with self._file(path) as client:
+            try:
+                client.upload_data(data, overwrite=mode != "create")
+            except self.exists_error as e:
+                raise AlreadyExistsError(path) from e
+
+    def head(self, path: str) -> dict:
+        with self._file(path) as client:
+            return {"path": path, "size": client.get_file_properties().size}
+
+    def list(self, prefix: str) -> Iterator[dict]:
+        try:
+            paths = list(self.connection.get_paths(path=prefix.rstrip("/"), recursive=True))
+        except self.not_found_error:
+            return
+        for p in paths:
+            if not p.is_directory and p.name.startswith(prefix):
+                yield {"path": p.name, "size": p.content_length}
+
+    def delete(self, path: str) -> None:
+        with self._file(path) as client:
+            client.delete_file()
+
+    @contextmanager
+    def open_writer(self, path: str, buffer_size: int = 8 * 1024 * 1024):
+        with self._file(path) as client:
+            writer = _PartWriter(buffer_size, lambda part, offset: client.append_data(
+                part, offset=offset, length=len(part)))
+            client.create_file()
+            try:
+                yield writer
+                writer.close()
+                client.flush_data(writer.offset)
+            except BaseException:
+                try:
+                    client.delete_file()
+                except Exception:
+                    pass
+                raise
+
+
+class LocalBackend(StorageBackend):
+    """
+    A directory on local disk. Objects are files under `root`; puts and
+    writers go to a temp file that is renamed into place, and a create is a
+    hard link, which fails if the target exists.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, path: str) -> str:
+        return os.path.join(self.root, *path.split("/"))
+
+    def _publish(self, tmp: str, path: str, mode: str) -> None:
+        target = self._path(path)
+        try:
+            if mode == "create":
+                try:
+                    os.link(tmp, target)
+                except FileExistsError:
+                    raise AlreadyExistsError(path) from None
+            else:
+                os.replace(tmp, target)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _temp(self, path: str):
+        directory = os.path.dirname(self._path(path))
+        os.makedirs(directory, exist_ok=True)
+        return tempfile.mkstemp(dir=directory, prefix=".", suffix=".part")
+
+    def get(self, path: str) -> bytes:
+        with open(self._path(path), "rb") as f:
+            return f.read()
+
+    def put(self, path: str, data: bytes, mode: str = "overwrite") -> None:
+        fd, tmp = self._temp(path)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        self._publish(tmp, path, mode)
+
+    def head(self, path: str) -> dict:
+        return {"path": path, "size": os.stat(self._path(path)).st_size}
+
+    def list(self, prefix: str) -> Iterator[dict]:
+        for directory, _, files in os.walk(self._path(prefix.rstrip("/")) if prefix.strip("/") else self.root):
+            for name in files:
+                if name.startswith(".") and name.endswith(".part"):
+                    continue  # a put or writer in progress
+                full = os.path.join(directory, name)
+                path = os.path.relpath(full, self.root).replace(os.sep, "/")
+                if path.startswith(prefix):
+                    try:
+                        yield {"path": path, "size": os.stat(full).st_size}
+                    except FileNotFoundError:
+                        pass  # deleted since the walk
+
+    def delete(self, path: str) -> None:
+        os.remove(self._path(path))
+
+    @contextmanager
+    def open_writer(self, path: str, buffer_size: int = 8 * 1024 * 1024):
+        fd, tmp = self._temp(path)
+        try:
+            with os.fdopen(fd, "wb", buffering=buffer_size) as f:
+                yield f
+        except BaseException:
+            os.remove(tmp)
+            raise
+        self._publish(tmp, path, "overwrite")
+
+
+class _PartWriter:
+    """write() buffer handing parts of buffer_size bytes to `append(part, offset)`."""
+
+    def __init__(self, buffer_size: int, append):
+        self.buffer_size = buffer_size
+        self.append = append
+        self.offset = 0
+        self._buffer = bytearray()
+        self._lock = threading.Lock()
+
+    def write(self, data) -> int:
+        with self._lock:
+            self._buffer += data
+            while len(self._buffer) >= self.buffer_size:
+                self._send(self.buffer_size)
+        return len(data)
+
+    def _send(self, n: int) -> None:
+        part = bytes(self._buffer[:n])
+        self.append(part, self.offset)
+        self.offset += len(part)
+        del self._buffer[:n]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._buffer:
+                self._send(len(self._buffer))
+
+
+def as_backend(store) -> StorageBackend:
+    """`store` as a StorageBackend: backends pass through, anything else is taken for an obstore store."""
+    return store if isinstance(store, StorageBackend) else ObstoreBackend(store)
@@ -1,66 +1,170 @@
 import fabric.functions as fn
 import logging
 import os
+import threading
+import time
+import uuid
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-from io import BytesIO, StringIO
+from io import BytesIO
 
 udf = fn.UserDataFunctions()
 
+# Reused across warm invocations; retries 429/5xx and dropped connections with backoff
+http = requests.Session()
+http.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=8, max_retries=Retry(
+    total=4, backoff_factor=0.5, backoff_jitter=0.5, status_forcelist=[429, 500, 502, 503, 504],
+    allowed_methods=["GET", "HEAD"], respect_retry_after_header=True, raise_on_status=False)))
+http.mount("http://", http.adapters["https://"])
+
+CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class ByteBudget:
+    """
+    Response bytes held in memory by all fetch threads together, at most max_bytes.
+    The ByteBudget of orchestration/new/scraping.py; copied so this UDF, which only needs
+    requests and pandas, doesn't load the ingestion engine and its helper modules for it.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.used = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, nbytes: int) -> int:
+        nbytes = min(nbytes, self.max_bytes)
+        with self._cond:
+            self._cond.wait_for(lambda: self.used + nbytes <= self.max_bytes)
+            self.used += nbytes
+        return nbytes
+
+    def release(self, nbytes: int) -> None:
+        with self._cond:
+            self.used -= nbytes
+            self._cond.notify_all()
+
+
 @udf.connection(argName="myLakehouse", alias="data")
 @udf.function()
-def download_to_lakehouse(myLakehouse: fn.FabricLakehouseClient, urls: list[str], folder: str) -> str:
-    # Ensure folder ends with slash
+def download_to_lakehouse(myLakehouse: fn.FabricLakehouseClient, urls: list[str], folder: str,
+                          maxWorkers: int = 4, memoryCapMb: int = 256) -> str:
+    # URLs are fetched by maxWorkers threads; bodies stream in CHUNK_SIZE blocks into
+    # append_data/flush_data uploads, with at most memoryCapMb of blocks held at once
     if not folder.endswith("/"):
         folder += "/"
 
     connection = myLakehouse.connectToFiles()
-    saved_paths = []
+    budget = ByteBudget(max(CHUNK_SIZE, memoryCapMb * 1024 * 1024))
+    summary = []
+    summary_lock = threading.Lock()
 
-    for url in urls:
-        filename = os.path.basename(urlparse(url).path)
-        if not filename:
-            continue  # Skip invalid URLs
+    def report(line: str) -> None:
+        with summary_lock:
+            summary.append(line)
 
+    def convert(filename: str, workbook: bytes, held: int) -> None:
+        """AEMO .xls sheet "PU and Scheduled Loads" to CSV, on the converter thread"""
         try:
-            # Make the request
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_4) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/81.0.4044.138 Safari/537.36'
-            }
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-
-            # Save to Lakehouse
-            target_path = folder + filename
-            file_client = connection.get_file_client(target_path)
-            file_client.upload_data(response.content, overwrite=True)
-            file_client.close()
+            start = time.monotonic()
+            df = pd.read_excel(BytesIO(workbook), sheet_name="PU and Scheduled Loads")
+            csv_buffer = BytesIO()
+            df.to_csv(csv_buffer, index=False)
 
-            saved_paths.append(target_path)
+            csv_filename = "nem-registration-and-exemption-list_PU_and_Scheduled_Loads.csv"
+            csv_path = folder + csv_filename
 
-            # ✨ NEW LOGIC: Handle AEMO .xls sheet "PU and Scheduled Loads"
-            if filename.lower() == "nem-registration-and-exemption-list.xls":
-                try:
-                    xls_bytes = BytesIO(response.content)
-                    df = pd.read_excel(xls_bytes, sheet_name="PU and Scheduled Loads")
+            csv_client = connection.get_file_client(csv_path)
+            try:
+                csv_client.upload_data(csv_buffer.getvalue(), overwrite=True)
+            finally:
+                csv_client.close()
 
-                    csv_buffer = StringIO()
-                    df.to_csv(csv_buffer, index=False)
+            report(f"{csv_path} - {csv_buffer.tell()} bytes converted in {time.monotonic() - start:.2f}s")
+        except Exception as e:
+            logging.error(f"Failed to convert sheet 'PU and Scheduled Loads' from {filename} to CSV: {str(e)}")
+        finally:
+            budget.release(held)
 
-                    csv_filename = "nem-registration-and-exemption-list_PU_and_Scheduled_Loads.csv"
-                    csv_path = folder + csv_filename
+    def fetch(url: str) -> None:
+        filename = os.path.basename(urlparse(url).path)
+        if not filename:
+            return  # Skip invalid URLs
+        # The workbook is kept whole for the conversion, within half the budget
+        workbook = BytesIO() if filename.lower() == "nem-registration-and-exemption-list.xls" else None
+        kept = 0
+        file_client = None
+        landed = False
 
-                    csv_client = connection.get_file_client(csv_path)
-                    csv_client.upload_data(csv_buffer.getvalue().encode('utf-8'), overwrite=True)
-                    csv_client.close()
+        try:
+            start = time.monotonic()
+            headers = {
+                'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_4) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/81.0.4044.138 Safari/537.36'
+            }
+            with http.get(url, headers=headers, timeout=(10, 30), stream=True) as response:
+                response.raise_for_status()
 
-                    saved_paths.append(csv_path)
-                except Exception as e:
-                    logging.error(f"Failed to convert sheet 'PU and Scheduled Loads' from {filename} to CSV: {str(e)}")
+                # Save to Lakehouse: create a temporary file, append each block at its offset, flush
+                # once at the end and only then rename it over the target, so a failed download
+                # never leaves a partial file (or a truncated previous copy) under the final name
+                target_path = folder + filename
+                file_client = connection.get_file_client(f"{folder}.{filename}.{uuid.uuid4().hex[:8]}.part")
+                file_client.create_file()
+                offset = 0
+                blocks = response.iter_content(chunk_size=CHUNK_SIZE)
+                while True:
+                    held = budget.acquire(CHUNK_SIZE)
+                    try:
+                        block = next(blocks, None)
+                        if block:
+                            file_client.append_data(block, offset=offset, length=len(block))
+                            offset += len(block)
+                    except BaseException:
+                        budget.release(held)
+                        raise
+                    if workbook is not None and block and kept + held <= budget.max_bytes // 2:
+                        workbook.write(block)
+                        kept += held
+                    else:
+                        if workbook is not None and block:
+                            logging.error(f"{filename} is too large to convert within memoryCapMb")
+                            workbook = None
+                            budget.release(kept)
+                            kept = 0
+                        budget.release(held)
+                    if not block:
+                        break
+                file_client.flush_data(offset)
+                file_client.rename_file(f"{file_client.file_system_name}/{target_path}").close()
+                landed = True
 
+            report(f"{target_path} - {offset} bytes in {time.monotonic() - start:.2f}s")
+            if workbook is not None:
+                conversions.append(converter.submit(convert, filename, workbook.getvalue(), kept))
+                kept = 0
         except Exception as e:
             logging.error(f"Failed to download {url}: {str(e)}")
+        finally:
+            if file_client is not None:
+                if not landed:
+                    try:
+                        file_client.delete_file()
+                    except Exception:
+                        pass  # never created, or already gone
+                file_client.close()
+            if kept:
+                budget.release(kept)
+
+    conversions = []
+    with ThreadPoolExecutor(max_workers=1) as converter:
+        with ThreadPoolExecutor(max_workers=max(1, maxWorkers)) as fetchers:
+            list(fetchers.map(fetch, urls))
+        for conversion in conversions:
+            conversion.result()
 
     connection.close()
-    return "\n".join(saved_paths)
+    return "\n".join(summary)